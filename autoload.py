@@ -1,34 +1,137 @@
+import json
 import os
 import sys
 import time
 
+import settings
+
 videoExtensions = ["mp4", "avi", "mov", "wmv", "flv", "mkv"]
 
+# 自動再生の対象とするクリップの経過時間（秒）
+RECENT_CLIP_SECONDS = 6 * 60 * 60
+
+# フォルダごとの検索結果を保存し、次回以降は変更されたフォルダのみ再検索する
+indexFilePath = settings.settingFolderPath / "clipindex.json"
+
+
+def isVideoFile(fileName: str):
+    return fileName.split(".")[-1].lower() in videoExtensions
+
+
+def loadIndex(indexPath):
+    try:
+        with open(indexPath, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def saveIndex(indexPath, index: dict):
+    try:
+        with open(indexPath, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+    except OSError:
+        pass
+
+
+# フォルダ内の動画ファイルとサブフォルダを取得する
+# フォルダの更新日時が前回と同じ場合は保存済みの結果を使用する
+def scanDirectory(path: str, oldIndex: dict, newIndex: dict):
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return [], []
+
+    cached = oldIndex.get(path)
+    if cached is not None and cached["mtime"] == mtime:
+        newIndex[path] = cached
+        return cached["files"], cached["dirs"]
+
+    files = []
+    dirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif isVideoFile(entry.name):
+                        files.append([entry.path, entry.stat().st_ctime])
+                except OSError:
+                    continue
+    except OSError:
+        return [], []
+
+    newIndex[path] = {"mtime": mtime, "files": files, "dirs": dirs}
+    return files, dirs
+
+
+# clipPath内の動画ファイルと作成日時、検索したフォルダを再帰的に取得
+# maxDepthより深いフォルダには入らない
+def scanClipFolder(path: str, maxDepth=5, indexPath=indexFilePath):
+    index = loadIndex(indexPath)
+    oldIndex = index.get("dirs", {}) if index.get("maxDepth") == maxDepth else {}
+    newIndex = {}
+
+    entries = []
+    scannedDirs = {}
+    stack = [(path, 0)]
+    while stack:
+        dirPath, depth = stack.pop()
+        files, dirs = scanDirectory(dirPath, oldIndex, newIndex)
+        entries.extend(files)
+        scannedDirs[dirPath] = depth
+        if depth < maxDepth:
+            stack.extend((d, depth + 1) for d in dirs)
+
+    # 他のフォルダの検索結果は残しておく
+    for dirPath, cached in oldIndex.items():
+        if not dirPath.startswith(path):
+            newIndex.setdefault(dirPath, cached)
+
+    # 変更が無い場合は書き込みを省略する
+    if newIndex != oldIndex:
+        saveIndex(indexPath, {"maxDepth": maxDepth, "dirs": newIndex})
+    return entries, scannedDirs
+
+
+def getVideoFileEntries(path: str, maxDepth=5, indexPath=indexFilePath):
+    entries, scannedDirs = scanClipFolder(path, maxDepth, indexPath)
+    return entries
+
+
+# 1つのフォルダ内の動画ファイルとサブフォルダを保存済みの結果を使わずに取得する
+def listDirectory(path: str):
+    return scanDirectory(path, {}, {})
+
+
+def isRecentClip(ctime: float):
+    return ctime > time.time() - RECENT_CLIP_SECONDS
+
 
 # clipPath内のすべてのファイルを再帰的に取得
 def getVideoFiles(path: str, maxDepth=5):
-    files = []
-    for root, dirs, fs in os.walk(path):
-        depth = root[len(path) - 1 :].count(os.sep)
-        if depth > maxDepth:
-            continue
-        for file in fs:
-            if file.split(".")[-1] in videoExtensions:
-                files.append(os.path.join(root, file))
-    return files
+    return [filePath for filePath, ctime in getVideoFileEntries(path, maxDepth)]
+
+
+def getNewestEntry(path: str):
+    entries = getVideoFileEntries(path)
+    if not entries:
+        return None
+    return max(entries, key=lambda entry: entry[1])
 
 
 def getNewestFile(path: str):
-    files = getVideoFiles(path)
-    if not files:
+    entry = getNewestEntry(path)
+    if entry is None:
         return None
-    return max(files, key=os.path.getctime)
+    return entry[0]
 
 
 def getRecentClip(clipPath: str):
-    clip = getNewestFile(clipPath)
+    entry = getNewestEntry(clipPath)
     # 6時間以内に作成されたファイルのみを対象とする
-    if clip and os.path.getctime(clip) > time.time() - 6 * 60 * 60:
-        return clip
+    if entry and isRecentClip(entry[1]):
+        return entry[0]
 
     return None
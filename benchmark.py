@@ -0,0 +1,242 @@
+# 処理速度の計測用スクリプト
+# 使用例: python benchmark.py autoload --files 100000
+#         python benchmark.py seekbar --frames 600
+#         python benchmark.py encode --duration 60 --chunks 1 2 4 8
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import autoload
+
+
+# 計測対象の関数を実行し、経過時間（秒）と結果を返す
+def measure(func, *args):
+    startTime = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - startTime, result
+
+
+# 変更前の実装（os.walkで全階層を走査し、ファイルごとに作成日時を再取得する）
+def legacyGetNewestFile(path: str, maxDepth=5):
+    files = []
+    for root, dirs, fs in os.walk(path):
+        depth = root[len(path) - 1 :].count(os.sep)
+        if depth > maxDepth:
+            continue
+        for file in fs:
+            if file.split(".")[-1] in autoload.videoExtensions:
+                files.append(os.path.join(root, file))
+    if not files:
+        return None
+    return max(files, key=os.path.getctime)
+
+
+# 指定した数のファイルを含むフォルダ構成を作成する
+# 半分のファイルはmaxDepthより深い階層に置き、枝刈りの効果を確認できるようにする
+def createTree(root: str, fileCount: int, filesPerDir: int = 100, deepLevels=8):
+    dirCount = max(1, fileCount // filesPerDir)
+    for i in range(dirCount):
+        if i % 2 == 0:
+            parts = ["game{}".format(i % 10), "session{}".format(i)]
+        else:
+            parts = ["deep{}".format(i % 10)] + ["d"] * deepLevels + [str(i)]
+        dirPath = os.path.join(root, *parts)
+        os.makedirs(dirPath, exist_ok=True)
+        for j in range(filesPerDir):
+            ext = "mp4" if j % 4 == 0 else "jpg"
+            open(os.path.join(dirPath, "clip{}.{}".format(j, ext)), "w").close()
+
+
+def benchmarkAutoload(args: argparse.Namespace):
+    workDir = tempfile.mkdtemp(prefix="To25_bench_")
+    try:
+        root = os.path.join(workDir, "clips")
+        indexPath = os.path.join(workDir, "clipindex.json")
+        print("{}ファイルのフォルダを作成中...".format(args.files))
+        createTree(root, args.files)
+
+        def newest():
+            entries = autoload.getVideoFileEntries(root, 5, indexPath)
+            return max(entries, key=lambda entry: entry[1])
+
+        legacyTime, _ = measure(legacyGetNewestFile, root)
+        coldTime, _ = measure(newest)
+        warmTime, _ = measure(newest)
+
+        # 1フォルダにファイルを追加した後の再検索
+        open(os.path.join(root, "game0", "session0", "new.mp4"), "w").close()
+        changedTime, result = measure(newest)
+
+        print("変更前の実装         : {:8.1f} ms".format(legacyTime * 1000))
+        print("scandir（初回）      : {:8.1f} ms".format(coldTime * 1000))
+        print("scandir（変更なし）  : {:8.1f} ms".format(warmTime * 1000))
+        print("scandir（1フォルダ変更）: {:8.1f} ms".format(changedTime * 1000))
+        print("最新のファイル: " + result[0])
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+# シークバーの1フレームあたりの描画時間を計測する
+# 全ての層を毎回描画する場合と、静的な層を画像として保持し線の周辺のみを描画する場合を比較する
+def benchmarkSeekbar(args: argparse.Namespace):
+    # 画面の無い環境でも実行できるようにする
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import numpy as np
+    from PyQt6.QtGui import QColor, QGuiApplication, QImage, QPainter, QPixmap
+
+    import seekbarrenderer
+
+    app = QGuiApplication.instance() or QGuiApplication([])
+
+    durationMs = args.duration * 1000
+    renderer = seekbarrenderer.SeekBarRenderer()
+    renderer.setSize(args.width, args.height)
+    renderer.setDuration(durationMs)
+    renderer.setTrim(durationMs // 4, durationMs * 3 // 4)
+    for index in range(seekbarrenderer.FILMSTRIP_COUNT):
+        pixmap = QPixmap(160, 90)
+        pixmap.fill(QColor.fromHsv(index * 18, 200, 200))
+        renderer.setFilmstripFrame(index, pixmap)
+    blocks = np.random.default_rng(0).uniform(-1, 1, (args.duration * 50, 3))
+    renderer.setWaveform(blocks.astype(np.float32))
+
+    image = QImage(args.width, args.height, QImage.Format.Format_ARGB32_Premultiplied)
+    positions = np.linspace(0, durationMs, args.frames).astype(int).tolist()
+
+    # 変更前の方法（再生位置が変わるたびに全ての層を描画する）
+    def fullRepaint():
+        for position in positions:
+            image.fill(0)
+            p = QPainter(image)
+            renderer.paintStaticLayers(p)
+            renderer.paintPlayhead(p, position)
+            p.end()
+
+    # 変更前後の線の周辺のみを描画する
+    def layeredRepaint():
+        oldPosition = positions[0]
+        for position in positions:
+            rect = renderer.playheadRect(oldPosition).united(
+                renderer.playheadRect(position)
+            )
+            p = QPainter(image)
+            p.setClipRect(rect)
+            renderer.paint(p, position, rect)
+            p.end()
+            oldPosition = position
+
+    # 静的な層の画像を作成しておく
+    def buildStaticLayers():
+        p = QPainter(image)
+        renderer.paint(p, 0)
+        p.end()
+
+    buildTime, _ = measure(buildStaticLayers)
+    fullTime, _ = measure(fullRepaint)
+    layeredTime, _ = measure(layeredRepaint)
+
+    frames = len(positions)
+    print("{}x{}, {}フレーム".format(args.width, args.height, frames))
+    print("静的な層の作成     : {:8.3f} ms".format(buildTime * 1000))
+    print("全ての層を描画     : {:8.3f} ms/フレーム".format(fullTime * 1000 / frames))
+    print(
+        "線の周辺のみを描画 : {:8.3f} ms/フレーム".format(layeredTime * 1000 / frames)
+    )
+
+
+# 分割する区間の数ごとに、並列エンコードの出力時間と容量を計測する
+def benchmarkEncode(args: argparse.Namespace):
+    import expoter
+    import probe
+
+    workDir = tempfile.mkdtemp(prefix="To25_bench_")
+    try:
+        # 2秒ごとにキーフレームがある1080p60のテスト映像を作成する
+        inputPath = os.path.join(workDir, "input.mp4")
+        print("{}秒のテスト映像を作成中...".format(args.duration))
+        probe.runFFmpeg(
+            [
+                "-f",
+                "lavfi",
+                "-i",
+                "testsrc2=s=1920x1080:r=60:d={}".format(args.duration),
+            ]
+            + ["-f", "lavfi", "-i", "sine=d={}".format(args.duration)]
+            + ["-c:v", "libx264", "-preset", "ultrafast", "-g", "120"]
+            + ["-c:a", "aac", "-shortest", "-y", inputPath]
+        )
+
+        durationMs = args.duration * 1000
+        plan = expoter.planExport(
+            args.size, args.duration, args.res, args.fps, False, "libx264"
+        )
+        print("{}, {}fps, {}MB".format(args.res, args.fps, args.size))
+
+        baseTime = None
+        for chunkCount in args.chunks:
+            outputPath = os.path.join(workDir, "output{}.mp4".format(chunkCount))
+            elapsed, result = measure(
+                expoter.encodeChunked,
+                inputPath,
+                outputPath,
+                0,
+                durationMs / 1000,
+                args.res,
+                args.fps,
+                "libx264",
+                plan,
+                args.two_pass,
+                chunkCount,
+            )
+            if result.returncode != 0:
+                print("{:2}分割: 失敗".format(chunkCount))
+                continue
+            baseTime = baseTime or elapsed
+            print(
+                "{:2}分割: {:8.2f} 秒 (x{:.2f})  {:6.2f} MB".format(
+                    chunkCount,
+                    elapsed,
+                    baseTime / elapsed,
+                    os.path.getsize(outputPath) / 1024 / 1024,
+                )
+            )
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="To25 ベンチマーク")
+    subparsers = parser.add_subparsers(dest="target", required=True)
+
+    autoloadParser = subparsers.add_parser("autoload", help="クリップの検索")
+    autoloadParser.add_argument("--files", type=int, default=100000)
+
+    seekbarParser = subparsers.add_parser("seekbar", help="シークバーの描画")
+    seekbarParser.add_argument("--frames", type=int, default=600)
+    seekbarParser.add_argument("--width", type=int, default=1280)
+    seekbarParser.add_argument("--height", type=int, default=40)
+    seekbarParser.add_argument("--duration", type=int, default=600)
+
+    encodeParser = subparsers.add_parser("encode", help="分割した並列エンコード")
+    encodeParser.add_argument("--duration", type=int, default=60)
+    encodeParser.add_argument("--chunks", type=int, nargs="+", default=[1, 2, 4, 8])
+    encodeParser.add_argument("--res", default="1920x1080")
+    encodeParser.add_argument("--fps", type=int, default=60)
+    encodeParser.add_argument("--size", type=int, default=50)
+    encodeParser.add_argument("--two-pass", action="store_true")
+
+    args = parser.parse_args(argv)
+    if args.target == "autoload":
+        benchmarkAutoload(args)
+    elif args.target == "seekbar":
+        benchmarkSeekbar(args)
+    elif args.target == "encode":
+        benchmarkEncode(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
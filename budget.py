@@ -0,0 +1,91 @@
+# 目標容量を映像・音声・コンテナのオーバーヘッドに配分する
+# ビットレートはすべてビット/秒で扱う
+
+# MP4のヘッダーなどの固定のオーバーヘッド（バイト）と、
+# パケット（映像のフレーム・音声のフレーム）ごとのインデックスのオーバーヘッド（バイト）
+CONTAINER_OVERHEAD_BYTES = 32 * 1024
+PACKET_OVERHEAD_BYTES = 16
+
+# AACの1秒あたりのフレーム数（48kHz、1024サンプル/フレーム）
+AUDIO_PACKETS_PER_SECOND = 48000 / 1024
+
+AUDIO_CODEC = "aac"
+# 使用する音声のビットレートの候補（高い順）
+AUDIO_BIT_RATES = [160000, 128000, 96000, 64000, 48000]
+# 音声に割り当てる容量の上限の割合
+MAX_AUDIO_RATIO = 0.1
+
+# エンコーダーのビットレート制御の誤差に対するマージン
+RATE_CONTROL_MARGIN = 0.97
+
+# 1ピクセル・1フレームあたりのビット数の上限
+# これ以上のビットレートを割り当てても画質はほとんど向上しない
+MAX_BITS_PER_PIXEL = 0.5
+MIN_VIDEO_BIT_RATE = 100000
+
+
+# 音声のビットレートを選ぶ（全体の一定割合以下に収まる最も高いもの）
+def chooseAudioBitRate(totalBitRate: float):
+    for bitRate in AUDIO_BIT_RATES:
+        if bitRate <= totalBitRate * MAX_AUDIO_RATIO:
+            return bitRate
+    return AUDIO_BIT_RATES[-1]
+
+
+# コンテナのオーバーヘッド（バイト）を見積もる
+def estimateOverhead(duration: float, framerate: int, noAudio: bool):
+    packetsPerSecond = framerate + (0 if noAudio else AUDIO_PACKETS_PER_SECOND)
+    return int(
+        CONTAINER_OVERHEAD_BYTES + PACKET_OVERHEAD_BYTES * packetsPerSecond * duration
+    )
+
+
+# 目標容量（バイト）と長さ（秒）から映像・音声のビットレートを決める
+# pixelsPerSecond（幅×高さ×フレームレート）を指定した場合は、
+# 画質が向上しない範囲まで映像のビットレートを上げないようにする
+# correctionはエンコーダーが指定より大きく・小さく出力する傾向の補正係数で、
+# 映像のビットレートにのみ掛ける（plannedBytesは補正前の容量）
+# 音声・映像の最低ビットレートのため目標容量に収まらない場合は、fitsがFalseになる
+def planBudget(
+    targetBytes: int,
+    duration: float,
+    framerate: int,
+    noAudio: bool,
+    pixelsPerSecond: int = None,
+    correction: float = 1.0,
+):
+    overheadBytes = estimateOverhead(duration, framerate, noAudio)
+    mediaBytes = max(targetBytes - overheadBytes, 0) * RATE_CONTROL_MARGIN
+    totalBitRate = mediaBytes * 8 / duration
+
+    audioBitRate = 0 if noAudio else chooseAudioBitRate(totalBitRate)
+    videoBitRate = totalBitRate - audioBitRate
+    if pixelsPerSecond:
+        videoBitRate = min(videoBitRate, pixelsPerSecond * MAX_BITS_PER_PIXEL)
+    videoBitRate = max(videoBitRate, MIN_VIDEO_BIT_RATE)
+    plannedBytes = int((videoBitRate + audioBitRate) * duration / 8) + overheadBytes
+
+    # 補正後に最低ビットレートまで引き上げた場合も含め、実際に出力される容量を見積もる
+    correctedVideoBitRate = max(int(videoBitRate * correction), MIN_VIDEO_BIT_RATE)
+    estimatedBytes = (
+        int((correctedVideoBitRate / correction + audioBitRate) * duration / 8)
+        + overheadBytes
+    )
+
+    return {
+        "videoBitRate": correctedVideoBitRate,
+        "audioBitRate": audioBitRate,
+        "audioCodec": None if noAudio else AUDIO_CODEC,
+        "overheadBytes": overheadBytes,
+        "targetBytes": targetBytes,
+        "plannedBytes": plannedBytes,
+        "correction": correction,
+        "estimatedBytes": estimatedBytes,
+        "fits": estimatedBytes <= targetBytes,
+    }
+
+
+# "1280x720" 形式の解像度とフレームレートから1秒あたりのピクセル数を求める
+def getPixelsPerSecond(resolution: str, framerate: int):
+    width, height = [int(x) for x in resolution.split("x")]
+    return width * height * framerate
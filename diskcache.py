@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+
+# 動画ファイルを (パス, サイズ, 更新日時) で識別する
+def getSourceKey(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return "{}|{}|{}".format(os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+
+# キャッシュのファイル名に使うハッシュ値を作成する
+def hashKey(*parts):
+    key = "|".join(str(part) for part in parts)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+# キャッシュを使用したことを記録する（更新日時を最終使用日時として使う）
+def touch(path):
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+# 最後に使用されたのが古いものから削除し、フォルダの合計サイズを上限以下にする
+def evictCache(folderPath, maxBytes: int):
+    files = []
+    total = 0
+    with os.scandir(folderPath) as entries:
+        for entry in entries:
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+    if total <= maxBytes:
+        return
+
+    for mtime, size, filePath in sorted(files):
+        try:
+            os.remove(filePath)
+        except OSError:
+            continue
+        total -= size
+        if total <= maxBytes:
+            break
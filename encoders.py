@@ -0,0 +1,139 @@
+import functools
+import hashlib
+import json
+import os
+
+import probe
+import settings
+
+encoderCacheFilePath = settings.settingFolderPath / "encoders.json"
+
+# 使用するエンコーダーの候補（優先順）
+ENCODER_CANDIDATES = {
+    "h264": [
+        "h264_nvenc",
+        "h264_qsv",
+        "h264_amf",
+        "h264_vaapi",
+        "libx264",
+        "libopenh264",
+    ],
+    "hevc": ["hevc_nvenc", "hevc_qsv", "hevc_amf", "hevc_vaapi", "libx265"],
+}
+
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+# ffprobeのプロファイル名と、エンコーダーの-profile:vに指定する名前
+PROFILE_NAMES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+    "Main 10": "main10",
+}
+
+
+# 入力ファイルより前に指定する必要がある引数
+def getInputArgs(encoder: str):
+    if encoder.endswith("_vaapi"):
+        return ["-vaapi_device", VAAPI_DEVICE]
+    return []
+
+
+# フィルターの末尾に追加する必要があるフィルター
+def getFilters(encoder: str):
+    if encoder.endswith("_vaapi"):
+        return ["format=nv12", "hwupload"]
+    return []
+
+
+# 元動画の映像と同じプロファイル・レベル・ピクセルフォーマットで出力する引数
+# （元動画の一部とつなげる場合に、パラメーターの違いを小さくする）
+# infoはprobe.probeVideoの結果で、エンコーダーが対応していない場合はffmpegが失敗する
+def getMatchingArgs(encoder: str, info: dict):
+    args = []
+    profile = PROFILE_NAMES.get(info["profile"])
+    if profile is not None:
+        args += ["-profile:v", profile]
+    # H.264のレベルは "31" のように10倍した値で取得される
+    if info["level"] is not None and info["videoCodec"] == "h264":
+        args += ["-level:v", "{:.1f}".format(info["level"] / 10)]
+    # ハードウェアに転送する場合はフィルターでフォーマットを指定する
+    if info["pixelFormat"] and not getFilters(encoder):
+        args += ["-pix_fmt", info["pixelFormat"]]
+    return args
+
+
+def hashFile(path: str):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+# ffmpegに組み込まれているエンコーダー名の一覧を取得
+def listEncoders():
+    result = probe.runFFmpeg(["-hide_banner", "-encoders"])
+    if result.returncode != 0:
+        return []
+
+    names = []
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        # " V....D libx264  ..." の形式
+        if len(fields) >= 2 and len(fields[0]) == 6:
+            names.append(fields[1])
+    return names
+
+
+# 短いテスト映像を実際にエンコードし、ハードウェアやドライバーが使用可能か確認する
+def testEncoder(encoder: str):
+    args = ["-hide_banner"] + getInputArgs(encoder)
+    args += ["-f", "lavfi", "-i", "color=c=black:s=256x144:r=30:d=0.2"]
+    filters = getFilters(encoder)
+    if filters:
+        args += ["-vf", ",".join(filters)]
+    args += ["-frames:v", "3", "-c:v", encoder, "-f", "null", "-"]
+    return probe.runFFmpeg(args).returncode == 0
+
+
+def loadCache():
+    try:
+        with open(encoderCacheFilePath, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def saveCache(cache: dict):
+    with open(encoderCacheFilePath, "w") as f:
+        json.dump(cache, f)
+
+
+# 使用可能なエンコーダーを優先順に返す
+# 結果はffmpegのハッシュ値と共に保存し、ffmpegが更新されるまで再確認しない
+@functools.lru_cache(maxsize=None)
+def getAvailableEncoders(codec: str = "h264"):
+    if not os.path.isfile(probe.FFMPEG_PATH):
+        return [codec]
+
+    ffmpegHash = hashFile(probe.FFMPEG_PATH)
+    cache = loadCache()
+    if cache.get("ffmpegHash") != ffmpegHash:
+        cache = {"ffmpegHash": ffmpegHash, "encoders": {}}
+
+    if codec not in cache["encoders"]:
+        listed = listEncoders()
+        cache["encoders"][codec] = [
+            encoder
+            for encoder in ENCODER_CANDIDATES[codec]
+            if encoder in listed and testEncoder(encoder)
+        ]
+        saveCache(cache)
+
+    # 候補が見つからない場合はffmpegの既定のエンコーダーを使用する
+    return cache["encoders"][codec] or [codec]
@@ -0,0 +1,186 @@
+import itertools
+import os
+import subprocess
+import threading
+
+import expoter
+
+# ジョブの状態（完了後はexpoterの出力結果の状態になる）
+JOB_WAITING = "waiting"
+JOB_RUNNING = "running"
+
+FINISHED_STATUSES = [
+    expoter.STATUS_DONE,
+    expoter.STATUS_CANCELLED,
+    expoter.STATUS_FAILED,
+]
+
+
+# 出力ジョブを順番に、指定した数まで並列に処理するキュー
+class ExportQueue:
+    def __init__(self, workerCount: int = 1, onJobChanged=None):
+        self.jobs = []
+        self.workers = []
+        self.workerCount = workerCount
+        self.onJobChanged = onJobChanged
+        self.isShutdown = False
+        self.jobIds = itertools.count(1)
+        self.condition = threading.Condition()
+
+        self.setWorkerCount(workerCount)
+
+    # args はexpoter.exportVideoの引数
+    def addJob(self, args: tuple):
+        with self.condition:
+            job = {
+                "id": next(self.jobIds),
+                "name": os.path.basename(args[1]),
+                "args": args,
+                "status": JOB_WAITING,
+                "progress": 0.0,
+                "speed": 0.0,
+                "result": None,
+                "cancelEvent": threading.Event(),
+            }
+            self.jobs.append(job)
+            self.condition.notify_all()
+
+        self.notify(job)
+        return job
+
+    def getJob(self, jobId: int):
+        for job in self.jobs:
+            if job["id"] == jobId:
+                return job
+        return None
+
+    # ジョブの順番を入れ替える（offsetが負の場合は前に移動）
+    def moveJob(self, jobId: int, offset: int):
+        with self.condition:
+            job = self.getJob(jobId)
+            if job is None:
+                return
+            index = self.jobs.index(job)
+            newIndex = min(max(index + offset, 0), len(self.jobs) - 1)
+            self.jobs.insert(newIndex, self.jobs.pop(index))
+
+        self.notify(job)
+
+    # 待機中のジョブは取り消し、出力中のジョブはffmpegを終了する
+    def cancelJob(self, jobId: int):
+        with self.condition:
+            job = self.getJob(jobId)
+            if job is None:
+                return
+            job["cancelEvent"].set()
+            if job["status"] == JOB_WAITING:
+                job["status"] = expoter.STATUS_CANCELLED
+            self.condition.notify_all()
+
+        self.notify(job)
+
+    # 終了したジョブを一覧から削除する
+    def removeJob(self, jobId: int):
+        with self.condition:
+            job = self.getJob(jobId)
+            if job is None or job["status"] not in FINISHED_STATUSES:
+                return
+            self.jobs.remove(job)
+
+        self.notify(job)
+
+    def clearFinishedJobs(self):
+        with self.condition:
+            self.jobs = [
+                job for job in self.jobs if job["status"] not in FINISHED_STATUSES
+            ]
+
+        self.notify(None)
+
+    def hasActiveJobs(self):
+        return any(job["status"] in [JOB_WAITING, JOB_RUNNING] for job in self.jobs)
+
+    # 同時に出力するジョブの数を変更する
+    def setWorkerCount(self, workerCount: int):
+        with self.condition:
+            self.workerCount = max(1, workerCount)
+            while len(self.workers) < self.workerCount:
+                worker = threading.Thread(target=self.workerLoop, daemon=True)
+                self.workers.append(worker)
+                worker.start()
+            self.condition.notify_all()
+
+    # 全てのジョブが終了するまで待機する
+    def join(self):
+        with self.condition:
+            while self.hasActiveJobs():
+                self.condition.wait()
+
+    # 全てのジョブを中断し、ワーカーを終了する
+    def shutdown(self):
+        with self.condition:
+            self.isShutdown = True
+            for job in self.jobs:
+                job["cancelEvent"].set()
+            self.condition.notify_all()
+
+    def notify(self, job: dict):
+        if self.onJobChanged is not None:
+            self.onJobChanged(job)
+
+    def runningCount(self):
+        return len([job for job in self.jobs if job["status"] == JOB_RUNNING])
+
+    # 先頭から順に待機中のジョブを取り出す（同時出力数の上限に達している場合はNone）
+    def takeNextJob(self):
+        if self.runningCount() >= self.workerCount:
+            return None
+        for job in self.jobs:
+            if job["status"] == JOB_WAITING:
+                job["status"] = JOB_RUNNING
+                return job
+        return None
+
+    def workerLoop(self):
+        while True:
+            with self.condition:
+                job = self.takeNextJob()
+                while job is None and not self.isShutdown:
+                    self.condition.wait()
+                    job = self.takeNextJob()
+                if self.isShutdown:
+                    return
+
+            self.notify(job)
+            try:
+                result = expoter.exportVideo(
+                    *job["args"],
+                    onProgress=self.progressCallback(job),
+                    cancelEvent=job["cancelEvent"],
+                )
+            except Exception as e:
+                # 想定外のエラーでもジョブを失敗として終わらせ、キューが止まらないようにする
+                result = expoter.buildResult(
+                    subprocess.CompletedProcess([], 1, "", str(e)),
+                    expoter.METHOD_ENCODE,
+                    job["args"][1],
+                    0.0,
+                    job["cancelEvent"],
+                )
+                result["error"] = "{}: {}".format(type(e).__name__, e)
+
+            with self.condition:
+                job["result"] = result
+                job["status"] = result["status"]
+                job["progress"] = 1.0
+                self.condition.notify_all()
+
+            self.notify(job)
+
+    def progressCallback(self, job: dict):
+        def func(progress: dict, job=job):
+            job["progress"] = progress["ratio"]
+            job["speed"] = progress["speed"]
+            self.notify(job)
+
+        return func
@@ -1,5 +1,954 @@
+import concurrent.futures
 import os
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+
+import budget
+import diskcache
+import encoders
+import history
+import keyframeindex
+import probe
+import segmentcache
+
+# 容量超過時に再出力する際のビットレートの安全マージン
+SIZE_MARGIN = 0.97
+
+# ストリームコピーでMP4に格納できるコーデック
+COPY_VIDEO_CODECS = ["h264", "hevc"]
+COPY_AUDIO_CODECS = ["aac", "mp3"]
+
+# -passによる2パスエンコードに対応したエンコーダー
+TWO_PASS_ENCODERS = ["libx264", "h264"]
+
+# 2パスで出力する場合の瞬間的なビットレートの上限（平均のビットレートに対する倍率）
+# 上限を平均と同じにすると、静止した場面の余りを動きの多い場面に回せず容量が余る
+TWO_PASS_MAX_RATE_RATIO = 2
+
+# 範囲を分割して並列にエンコードできるソフトウェアエンコーダー
+# （ハードウェアエンコーダーは同時に実行しても速くならないため分割しない）
+CHUNKED_ENCODERS = ["libx264", "libopenh264"]
+# 分割する1区間の最短の長さ（秒）と、1区間のエンコードに使うスレッド数の目安
+MIN_CHUNK_SECONDS = 10
+THREADS_PER_CHUNK = 4
+
+# トリミング位置をキーフレーム上とみなす誤差（秒）
+KEYFRAME_TOLERANCE = 0.01
+
+# 静止した場面を間引く場合に、連続して取り除くフレームの長さの上限（秒）
+# （シークできるよう、静止した場面でも一定の間隔でフレームを残す）
+DECIMATE_MAX_DROP_SECONDS = 1
+
+# 出力結果
+STATUS_DONE = "done"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+# 出力方式
+METHOD_COPY = "copy"
+METHOD_SMART = "smart"
+METHOD_ENCODE = "encode"
+
+
+# 複数回のffmpegの実行からなる処理で、各実行の進捗を全体の進捗に変換する
+def stageProgress(onProgress, stage: int, stageCount: int):
+    if onProgress is None:
+        return None
+
+    def func(progress: dict):
+        progress = dict(progress)
+        progress["ratio"] = (stage + progress["ratio"]) / stageCount
+        onProgress(progress)
+
+    return func
+
+
+def buildInputArgs(inputPath: str, trimStartPosMs: int, duration: float):
+    return [
+        "-ss",
+        str(trimStartPosMs / 1000),
+        "-i",
+        inputPath,
+        "-t",
+        str(duration),
+    ]
+
+
+# 最低ビットレートでも指定した容量に収まらないため出力しない場合のエラー
+class SizeError(Exception):
+    pass
+
+
+# 容量に収まらないことが確実な計画ではエンコードしない
+def checkPlan(plan: dict):
+    if not plan["fits"]:
+        raise SizeError(
+            "指定した容量に収まりません（約{:.1f}MB必要です）".format(
+                plan["estimatedBytes"] / 1024 / 1024
+            )
+        )
+
+
+# 目標容量（MB）と出力設定から映像・音声のビットレートを決める
+# エンコーダーを指定した場合は、過去の出力結果から求めた補正係数を使用する
+def planExport(
+    size: int,
+    duration: float,
+    resolution: str,
+    framerate: int,
+    noAudio: bool,
+    encoder: str = None,
+    twoPass: bool = True,
+):
+    correction = 1.0
+    if encoder is not None:
+        correction = history.getCorrectionFactor(encoder, resolution, twoPass)
+    return budget.planBudget(
+        size * 1024 * 1024,
+        duration,
+        framerate,
+        noAudio,
+        budget.getPixelsPerSecond(resolution, framerate),
+        correction,
+    )
+
+
+# 切り抜く範囲 {"x", "y", "width", "height"}（元動画のピクセル）を、
+# 縦横比を保ったまま解像度の枠内に収めた出力の解像度を返す
+# 切り抜いた範囲より大きくは拡大しない（幅・高さはエンコーダーのため偶数にする）
+def getCroppedResolution(resolution: str, crop: dict = None):
+    if crop is None:
+        return resolution
+    width, height = [int(x) for x in resolution.split("x")]
+    scale = min(width / crop["width"], height / crop["height"], 1.0)
+    return "{}x{}".format(
+        max(int(crop["width"] * scale) // 2 * 2, 2),
+        max(int(crop["height"] * scale) // 2 * 2, 2),
+    )
+
+
+# 切り抜きを指定した場合は、スケーリングの前に切り抜く
+# decimateFramerateを指定した場合は、スケーリングの前にほぼ同じフレームを取り除く
+def buildScaleFilters(
+    resolution: str, crop: dict = None, decimateFramerate: int = None
+):
+    filters = []
+    if crop is not None:
+        filters.append("crop={width}:{height}:{x}:{y}".format(**crop))
+    if decimateFramerate is not None:
+        filters += buildDecimateFilters(decimateFramerate)
+    return filters + ["scale=" + resolution.replace("x", ":")]
+
+
+# 出力のフレームレートに揃えてから、直前のフレームとほぼ同じフレームを取り除く
+def buildDecimateFilters(framerate: int):
+    return [
+        "fps={}".format(framerate),
+        "mpdecimate=max={}".format(framerate * DECIMATE_MAX_DROP_SECONDS),
+    ]
+
+
+# 間引く場合は可変フレームレートで出力し、取り除いたフレームを複製し直さないようにする
+def buildFrameRateArgs(framerate: int, decimate: bool = False):
+    if decimate:
+        return ["-fps_mode", "vfr"]
+    return ["-r", str(framerate)]
+
+
+# 出力する長さ（秒）（複数の範囲を連結する場合は合計の長さ）
+def getExportDuration(trimStartPosMs: int, trimEndPosMs: int, ranges: list = None):
+    if ranges:
+        return round(sum(endMs - startMs for startMs, endMs in ranges) / 1000, 2)
+    return round((trimEndPosMs - trimStartPosMs) / 1000, 2)
+
+
+# 出力の長さとフレームレートから求めたフレーム数と、実際のフレーム数の差
+def countDroppedFrames(outputPath: str, duration: float, framerate: int):
+    info = probe.probeVideo(outputPath)
+    if info is None or info["frameCount"] == 0:
+        return 0
+    return max(round(duration * framerate) - info["frameCount"], 0)
+
+
+# ビットレートはビット/秒の数値で指定する（"KB"などの接尾辞は使わない）
+# resolutionは出力の解像度（切り抜く場合はgetCroppedResolutionで求めたもの）
+def buildVideoArgs(
+    resolution: str,
+    framerate: int,
+    encoder: str,
+    videoBitRate: int,
+    crop: dict = None,
+    decimate: bool = False,
+    twoPass: bool = False,
+):
+    # ハードウェアエンコーダーへの転送はスケーリングの後に行う
+    filters = buildScaleFilters(resolution, crop, framerate if decimate else None)
+    filters += encoders.getFilters(encoder)
+    args = ["-vf", ",".join(filters)] + buildFrameRateArgs(framerate, decimate)
+    return args + buildCodecArgs(encoder, videoBitRate, twoPass)
+
+
+# 2パス（NVENCの場合は内部の2パス）で出力するか
+def isTwoPass(encoder: str, twoPass: bool):
+    return twoPass and (encoder in TWO_PASS_ENCODERS or encoder == "h264_nvenc")
+
+
+def buildCodecArgs(encoder: str, videoBitRate: int, twoPass: bool = False):
+    args = ["-c:v", encoder, "-b:v", str(videoBitRate)]
+    # 2パスでは場面ごとにビットレートを配分できるよう上限を緩め、
+    # 超過した場合は実測値からの再出力で調整する
+    if isTwoPass(encoder, twoPass):
+        maxRate = videoBitRate * TWO_PASS_MAX_RATE_RATIO
+        return args + ["-maxrate", str(maxRate), "-bufsize", str(maxRate * 2)]
+    # 1パスでは瞬間的なビットレートの上振れを抑える
+    args += ["-maxrate", str(videoBitRate), "-bufsize", str(videoBitRate * 2)]
+    return args
+
+
+# 複数の範囲をそれぞれ入力として開く（範囲ごとにシークし、範囲の間はデコードしない）
+def buildRangeInputArgs(inputPath: str, ranges: list):
+    args = []
+    for startMs, endMs in ranges:
+        args += ["-ss", str(startMs / 1000), "-t", str((endMs - startMs) / 1000)]
+        args += ["-i", inputPath]
+    return args
+
+
+# 各入力を連結してからスケーリングする（音声を含める場合は[a]として出力する）
+def buildRangeVideoArgs(
+    rangeCount: int,
+    resolution: str,
+    framerate: int,
+    encoder: str,
+    videoBitRate: int,
+    withAudio: bool,
+    crop: dict = None,
+    decimate: bool = False,
+    twoPass: bool = False,
+):
+    streams = "".join(
+        "[{0}:v][{0}:a]".format(i) if withAudio else "[{}:v]".format(i)
+        for i in range(rangeCount)
+    )
+    filters = buildScaleFilters(resolution, crop, framerate if decimate else None)
+    filters += encoders.getFilters(encoder)
+    graph = "{}concat=n={}:v=1:a={}{};[cv]{}[v]".format(
+        streams,
+        rangeCount,
+        int(withAudio),
+        "[cv][a]" if withAudio else "[cv]",
+        ",".join(filters),
+    )
+    args = ["-filter_complex", graph, "-map", "[v]"]
+    args += buildFrameRateArgs(framerate, decimate)
+    return args + buildCodecArgs(encoder, videoBitRate, twoPass)
+
+
+def buildAudioArgs(plan: dict):
+    if plan["audioCodec"] is None:
+        return ["-an"]
+    return ["-c:a", plan["audioCodec"], "-b:a", str(plan["audioBitRate"])]
+
+
+# 1回のエンコードを実行する
+# rangesに (開始位置, 終了位置)（ミリ秒）のリストを指定した場合は、それらを連結して出力する
+# cropを指定した場合は、その範囲を切り抜いてからresolutionにスケーリングする
+# decimateを指定した場合は、静止した場面のフレームを間引いて可変フレームレートで出力する
+def encode(
+    inputPath: str,
+    outputPath: str,
+    trimStartPosMs: int,
+    duration: float,
+    resolution: str,
+    framerate: int,
+    encoder: str,
+    plan: dict,
+    twoPass: bool,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+    threads: int = None,
+    ranges: list = None,
+    crop: dict = None,
+    decimate: bool = False,
+):
+    if ranges:
+        inputArgs = encoders.getInputArgs(encoder)
+        inputArgs += buildRangeInputArgs(inputPath, ranges)
+        withAudio = plan["audioCodec"] is not None
+        videoArgs = buildRangeVideoArgs(
+            len(ranges),
+            resolution,
+            framerate,
+            encoder,
+            plan["videoBitRate"],
+            withAudio,
+            crop,
+            decimate,
+            twoPass,
+        )
+        # 1パス目は音声を出力しないため、音声を連結しないフィルターにする
+        firstPassVideoArgs = buildRangeVideoArgs(
+            len(ranges),
+            resolution,
+            framerate,
+            encoder,
+            plan["videoBitRate"],
+            False,
+            crop,
+            decimate,
+            twoPass,
+        )
+        audioArgs = (["-map", "[a]"] if withAudio else []) + buildAudioArgs(plan)
+    else:
+        inputArgs = encoders.getInputArgs(encoder) + buildInputArgs(
+            inputPath, trimStartPosMs, duration
+        )
+        videoArgs = buildVideoArgs(
+            resolution,
+            framerate,
+            encoder,
+            plan["videoBitRate"],
+            crop,
+            decimate,
+            twoPass,
+        )
+        firstPassVideoArgs = videoArgs
+        audioArgs = buildAudioArgs(plan)
+    if threads:
+        videoArgs = videoArgs + ["-threads", str(threads)]
+        firstPassVideoArgs = firstPassVideoArgs + ["-threads", str(threads)]
+
+    if not twoPass:
+        return probe.runFFmpeg(
+            inputArgs + videoArgs + audioArgs + ["-y", outputPath],
+            duration,
+            onProgress,
+            cancelEvent,
+        )
+
+    # NVENCはエンコーダー内部の2パスを使用する
+    if encoder == "h264_nvenc":
+        rateControlArgs = ["-rc", "vbr", "-multipass", "fullres"]
+        return probe.runFFmpeg(
+            inputArgs + videoArgs + rateControlArgs + audioArgs + ["-y", outputPath],
+            duration,
+            onProgress,
+            cancelEvent,
+        )
+
+    # 2パスに対応していないエンコーダーは最大ビットレートの制限のみで出力する
+    if encoder not in TWO_PASS_ENCODERS:
+        return probe.runFFmpeg(
+            inputArgs + videoArgs + audioArgs + ["-y", outputPath],
+            duration,
+            onProgress,
+            cancelEvent,
+        )
+
+    # 1パス目で解析を行い、2パス目で目標ビットレートに合わせて出力する
+    passLogDir = tempfile.mkdtemp(prefix="To25_")
+    passLogFile = os.path.join(passLogDir, "pass")
+    try:
+        result = probe.runFFmpeg(
+            inputArgs
+            + firstPassVideoArgs
+            + ["-pass", "1", "-passlogfile", passLogFile, "-an", "-f", "null"]
+            + ["-y", os.devnull],
+            duration,
+            stageProgress(onProgress, 0, 2),
+            cancelEvent,
+        )
+        if result.returncode != 0:
+            return result
+
+        return probe.runFFmpeg(
+            inputArgs
+            + videoArgs
+            + ["-pass", "2", "-passlogfile", passLogFile]
+            + audioArgs
+            + ["-y", outputPath],
+            duration,
+            stageProgress(onProgress, 1, 2),
+            cancelEvent,
+        )
+    finally:
+        shutil.rmtree(passLogDir, ignore_errors=True)
+
+
+# 並列エンコードする区間の数を決める（分割しない場合は1）
+def getChunkCount(duration: float, encoder: str):
+    if encoder not in CHUNKED_ENCODERS:
+        return 1
+    cpuCount = os.cpu_count() or 1
+    return max(
+        1, min(cpuCount // THREADS_PER_CHUNK, int(duration // MIN_CHUNK_SECONDS))
+    )
+
+
+# 範囲をキーフレームの位置でおおよそ等しい長さの区間に分割し、
+# (開始位置（ミリ秒）, 長さ（秒）) のリストを返す
+# 区間の境界は出力のフレームの間隔に揃え、結合後のタイムスタンプが連続するようにする
+def splitChunks(
+    keyframes: list,
+    trimStartPosMs: int,
+    trimEndPosMs: int,
+    framerate: int,
+    chunkCount: int,
+):
+    startSec = trimStartPosMs / 1000
+    duration = (trimEndPosMs - trimStartPosMs) / 1000
+    offsets = [0.0]
+    for index in range(1, chunkCount):
+        idealSec = startSec + duration * index / chunkCount
+        candidates = [
+            k - startSec
+            for k in keyframes
+            if offsets[-1] + MIN_CHUNK_SECONDS <= k - startSec
+            and k - startSec <= duration - MIN_CHUNK_SECONDS
+        ]
+        if not candidates:
+            break
+        offset = min(candidates, key=lambda c: abs(startSec + c - idealSec))
+        offsets.append(round(offset * framerate) / framerate)
+    offsets.append(duration)
+
+    return [
+        (trimStartPosMs + int(round(offsets[i] * 1000)), offsets[i + 1] - offsets[i])
+        for i in range(len(offsets) - 1)
+    ]
+
+
+# 範囲をキーフレームで分割して映像のみを並列にエンコードし、無劣化で結合する
+# 各区間には全体で計画した同じビットレートを割り当て、音声は結合時に範囲全体から1度でエンコードする
+# useCacheを指定した場合は固定の位置で分割し、エンコード済みの区間を再利用する
+# 分割できない場合は通常のエンコードを行う
+def encodeChunked(
+    inputPath: str,
+    outputPath: str,
+    trimStartPosMs: int,
+    duration: float,
+    resolution: str,
+    framerate: int,
+    encoder: str,
+    plan: dict,
+    twoPass: bool,
+    chunkCount: int,
+    useCache: bool = False,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+    crop: dict = None,
+):
+    endMs = trimStartPosMs + int(round(duration * 1000))
+    keyframes = []
+    if useCache or chunkCount > 1:
+        keyframes = keyframeindex.loadKeyframes(inputPath)
+
+    sourceKey = diskcache.getSourceKey(inputPath) if useCache else None
+    if sourceKey is not None:
+        chunks = segmentcache.getSegments(keyframes, trimStartPosMs, endMs, framerate)
+    elif chunkCount > 1:
+        chunks = splitChunks(keyframes, trimStartPosMs, endMs, framerate, chunkCount)
+    else:
+        chunks = []
+    if sourceKey is None and len(chunks) < 2:
+        return encode(
+            inputPath,
+            outputPath,
+            trimStartPosMs,
+            duration,
+            resolution,
+            framerate,
+            encoder,
+            plan,
+            twoPass,
+            onProgress,
+            cancelEvent,
+            crop=crop,
+        )
+
+    # 各区間の進捗を長さで重み付けして全体の進捗にする（結合の分を1割とする）
+    progresses = [{"time": 0.0, "frame": 0, "speed": 0.0, "ratio": 0.0}] * len(chunks)
+    progressLock = threading.Lock()
+
+    def updateProgress(index: int, progress: dict):
+        with progressLock:
+            progresses[index] = progress
+            ratio = sum(
+                p["ratio"] * chunkDuration
+                for p, (startMs, chunkDuration) in zip(progresses, chunks)
+            )
+            onProgress(
+                {
+                    "time": sum(p["time"] for p in progresses),
+                    "frame": sum(p["frame"] for p in progresses),
+                    "speed": sum(p["speed"] for p in progresses),
+                    "ratio": ratio / duration * 0.9,
+                }
+            )
+
+    def chunkProgress(index: int):
+        if onProgress is None:
+            return None
+        return lambda progress: updateProgress(index, progress)
+
+    workDir = tempfile.mkdtemp(prefix="To25_")
+    try:
+        # キャッシュを使う場合は、エンコード済みの区間を探して無いものだけをエンコードする
+        chunkPaths = [
+            os.path.join(workDir, "chunk{}.mp4".format(index))
+            for index in range(len(chunks))
+        ]
+        pending = list(range(len(chunks)))
+        videoBitRate = plan["videoBitRate"]
+        if sourceKey is not None:
+            # 切り抜く場合は切り抜く範囲もキーに含める
+            encodeSettings = [encoder, resolution, framerate, twoPass]
+            if crop is not None:
+                encodeSettings += buildScaleFilters(resolution, crop)
+            prefixes = [
+                segmentcache.getCachePrefix(
+                    sourceKey, startMs, chunkDuration, *encodeSettings
+                )
+                for startMs, chunkDuration in chunks
+            ]
+            pending = []
+            cachedBits = 0
+            cachedDuration = 0.0
+            totalBits = plan["videoBitRate"] * duration
+            minBitRate = plan["videoBitRate"] * (1 - segmentcache.BIT_RATE_TOLERANCE)
+            maxBits = totalBits * (1 + segmentcache.BUDGET_SLACK)
+            for index, (startMs, chunkDuration) in enumerate(chunks):
+                otherDuration = duration - cachedDuration - chunkDuration
+                # 他の区間のビットレートが許容範囲を下回ってしまうものは再利用しない
+                for path, bitRate in segmentcache.findSegments(
+                    prefixes[index], plan["videoBitRate"]
+                ):
+                    requiredBits = cachedBits + bitRate * chunkDuration
+                    if requiredBits + otherDuration * minBitRate > maxBits:
+                        continue
+                    if diskcache.touch(path):
+                        chunkPaths[index] = path
+                        break
+                else:
+                    pending.append(index)
+                    continue
+                cachedBits += bitRate * chunkDuration
+                cachedDuration += chunkDuration
+                if onProgress is not None:
+                    updateProgress(
+                        index,
+                        {"time": chunkDuration, "frame": 0, "speed": 0.0, "ratio": 1.0},
+                    )
+
+            # 再利用する区間と計画のビットレートの差の分を、新しくエンコードする区間で調整する
+            pendingDuration = sum(chunks[index][1] for index in pending)
+            if pending and cachedBits > 0:
+                videoBitRate = max(
+                    int((totalBits - cachedBits) / pendingDuration),
+                    budget.MIN_VIDEO_BIT_RATE,
+                )
+            for index in pending:
+                chunkPaths[index] = str(
+                    segmentcache.getCachePath(prefixes[index], videoBitRate)
+                )
+
+        videoPlan = dict(plan, videoBitRate=videoBitRate, audioCodec=None)
+        workerCount = max(1, min(chunkCount, len(pending)))
+        threads = max(1, (os.cpu_count() or 1) // workerCount)
+
+        # 書き込み途中のファイルをキャッシュとして使わないよう、完了後に移動する
+        # （同じ動画を同時に出力する場合に備え、一時ファイル名はスレッドごとに変える）
+        def encodeChunk(index: int):
+            startMs, chunkDuration = chunks[index]
+            tempPath = "{}.{}.tmp.mp4".format(chunkPaths[index], threading.get_ident())
+            result = encode(
+                inputPath,
+                tempPath,
+                startMs,
+                chunkDuration,
+                resolution,
+                framerate,
+                encoder,
+                videoPlan,
+                twoPass,
+                chunkProgress(index),
+                cancelEvent,
+                threads,
+                crop=crop,
+            )
+            try:
+                if result.returncode == 0:
+                    os.replace(tempPath, chunkPaths[index])
+                else:
+                    os.remove(tempPath)
+            except OSError:
+                pass
+            return result
+
+        # ffmpegのプロセスを区間ごとに並列に実行する
+        with concurrent.futures.ThreadPoolExecutor(workerCount) as executor:
+            results = list(executor.map(encodeChunk, pending))
+        for result in results:
+            if result.returncode != 0:
+                return result
+
+        listPath = os.path.join(workDir, "list.txt")
+        with open(listPath, "w", encoding="utf-8") as f:
+            for chunkPath in chunkPaths:
+                f.write("file '{}'\n".format(chunkPath.replace("\\", "/")))
+
+        args = ["-f", "concat", "-safe", "0", "-i", listPath]
+        if plan["audioCodec"] is None:
+            args += ["-map", "0:v", "-c:v", "copy", "-an"]
+        else:
+            args += buildInputArgs(inputPath, trimStartPosMs, duration)
+            args += ["-map", "0:v", "-map", "1:a?", "-c:v", "copy"]
+            args += buildAudioArgs(plan)
+        return probe.runFFmpeg(
+            args + ["-y", outputPath],
+            duration,
+            stageProgress(onProgress, 9, 10),
+            cancelEvent,
+        )
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+        if sourceKey is not None:
+            segmentcache.evictCache()
+
+
+# 再エンコードせずにストリームコピーで出力できるかを判定する
+def canStreamCopy(
+    info: dict,
+    duration: float,
+    resolution: str,
+    framerate: int,
+    size: int,
+    noAudio: bool,
+):
+    if info is None or info["videoCodec"] not in COPY_VIDEO_CODECS:
+        return False
+    if not noAudio and info["audioCodec"] not in COPY_AUDIO_CODECS + [None]:
+        return False
+    if f"{info['width']}x{info['height']}" != resolution:
+        return False
+    if abs(info["frameRate"] - framerate) > 0.5:
+        return False
+
+    # キーフレーム位置による範囲の拡大を考慮してマージンを取る
+    estimatedSize = info["bitRate"] / 8 * duration
+    return estimatedSize < size * 1024 * 1024 * SIZE_MARGIN
+
+
+# トリミング開始位置がキーフレーム上にあるか
+def isKeyframeAligned(keyframes: list, trimStartPosMs: int):
+    startSec = trimStartPosMs / 1000
+    return any(abs(k - startSec) <= KEYFRAME_TOLERANCE for k in keyframes)
+
+
+# トリミング範囲内にストリームコピーできるGOPがあるか
+def hasInnerKeyframes(keyframes: list, trimStartPosMs: int, trimEndPosMs: int):
+    startSec = trimStartPosMs / 1000
+    endSec = trimEndPosMs / 1000
+    return len([k for k in keyframes if startSec <= k <= endSec]) >= 2
+
+
+def streamCopy(
+    inputPath: str,
+    outputPath: str,
+    trimStartPosMs: int,
+    duration: float,
+    noAudio: bool,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    args = buildInputArgs(inputPath, trimStartPosMs, duration)
+    args += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+    if noAudio:
+        args.append("-an")
+    return probe.runFFmpeg(args + ["-y", outputPath], duration, onProgress, cancelEvent)
+
+
+# 範囲の一部を元動画と同じコーデック・ビットレートで再エンコードする
+# （コンテナ全体のビットレートは音声を含むため、映像ストリームのビットレートを使う）
+def encodePiece(
+    inputPath: str,
+    outputPath: str,
+    startSec: float,
+    duration: float,
+    info: dict,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    for encoder in encoders.getAvailableEncoders(info["videoCodec"]):
+        args = encoders.getInputArgs(encoder)
+        args += ["-ss", str(startSec), "-i", inputPath, "-t", str(duration), "-an"]
+        filters = encoders.getFilters(encoder)
+        if filters:
+            args += ["-vf", ",".join(filters)]
+        videoBitRate = info["videoBitRate"] or info["bitRate"]
+        args += ["-c:v", encoder, "-b:v", str(videoBitRate)]
+        args += encoders.getMatchingArgs(encoder, info)
+        args += ["-y", outputPath]
+        result = probe.runFFmpeg(args, duration, onProgress, cancelEvent)
+        if result.returncode == 0:
+            break
+    return result
+
+
+# トリミング位置を含むGOPのみを再エンコードし、その間はストリームコピーして結合する
+# 音声は元動画のコーデックが対応していればコピーし、そうでなければplanのビットレートでエンコードする
+def smartRender(
+    inputPath: str,
+    outputPath: str,
+    trimStartPosMs: int,
+    trimEndPosMs: int,
+    info: dict,
+    keyframes: list,
+    noAudio: bool,
+    plan: dict,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    startSec = trimStartPosMs / 1000
+    endSec = trimEndPosMs / 1000
+    headEnd = min(k for k in keyframes if k >= startSec - KEYFRAME_TOLERANCE)
+    tailStart = max(k for k in keyframes if k <= endSec + KEYFRAME_TOLERANCE)
+
+    workDir = tempfile.mkdtemp(prefix="To25_")
+    try:
+        # 各パーツはSPS/PPSを含むMPEG-TSで作成し、結合時のパラメーター差異に対応する
+        # MP4のヘッダーには最初のパーツのパラメーターしか入らないため、
+        # 再エンコードするパーツは元動画と同じプロファイル・レベル・ピクセルフォーマットにする
+        pieces = []
+        if headEnd - startSec > KEYFRAME_TOLERANCE:
+            piecePath = os.path.join(workDir, "head.ts")
+            result = encodePiece(
+                inputPath,
+                piecePath,
+                startSec,
+                headEnd - startSec,
+                info,
+                stageProgress(onProgress, 0, 4),
+                cancelEvent,
+            )
+            if result.returncode != 0:
+                return result
+            pieces.append(piecePath)
+
+        piecePath = os.path.join(workDir, "middle.ts")
+        result = probe.runFFmpeg(
+            ["-ss", str(headEnd), "-i", inputPath, "-t", str(tailStart - headEnd)]
+            + ["-an", "-c:v", "copy", "-y", piecePath],
+            tailStart - headEnd,
+            stageProgress(onProgress, 1, 4),
+            cancelEvent,
+        )
+        if result.returncode != 0:
+            return result
+        pieces.append(piecePath)
+
+        if endSec - tailStart > KEYFRAME_TOLERANCE:
+            piecePath = os.path.join(workDir, "tail.ts")
+            result = encodePiece(
+                inputPath,
+                piecePath,
+                tailStart,
+                endSec - tailStart,
+                info,
+                stageProgress(onProgress, 2, 4),
+                cancelEvent,
+            )
+            if result.returncode != 0:
+                return result
+            pieces.append(piecePath)
+
+        listPath = os.path.join(workDir, "list.txt")
+        with open(listPath, "w", encoding="utf-8") as f:
+            for piece in pieces:
+                f.write("file '{}'\n".format(piece.replace("\\", "/")))
+
+        # 映像を結合し、音声は元動画のトリミング範囲から付け直す
+        args = ["-f", "concat", "-safe", "0", "-i", listPath]
+        if noAudio:
+            args += ["-map", "0:v", "-c:v", "copy"]
+        else:
+            args += buildInputArgs(inputPath, trimStartPosMs, endSec - startSec)
+            args += ["-map", "0:v", "-map", "1:a?", "-c:v", "copy"]
+            if info["audioCodec"] in COPY_AUDIO_CODECS:
+                args += ["-c:a", "copy"]
+            else:
+                args += buildAudioArgs(plan)
+        return probe.runFFmpeg(
+            args + ["-y", outputPath],
+            endSec - startSec,
+            stageProgress(onProgress, 3, 4),
+            cancelEvent,
+        )
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+
+# 出力方式を選択して動画を出力し、最後に実行したffmpegの結果と出力方式を返す
+# rangesに (開始位置, 終了位置)（ミリ秒）のリストを指定した場合は、それらを連結して出力する
+# cropに範囲を指定した場合は切り抜いて出力する（容量の配分も切り抜いた後の解像度で行う）
+# decimateを指定した場合は、静止した場面のフレームを間引いて可変フレームレートで出力する
+def renderVideo(
+    inputPath: str,
+    outputPath: str,
+    trimStartPosMs: int,
+    trimEndPosMs: int,
+    resolution: str,
+    framerate: int,
+    size: int,
+    noAudio: bool,
+    twoPass: bool = True,
+    allowCopy: bool = True,
+    parallelEncode: bool = False,
+    reuseSegments: bool = False,
+    ranges: list = None,
+    crop: dict = None,
+    decimate: bool = False,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    duration = getExportDuration(trimStartPosMs, trimEndPosMs, ranges)
+
+    # 複数の範囲を連結する場合は、合計の長さで容量を配分し、常に再エンコードする
+    if ranges:
+        info = probe.probeVideo(inputPath)
+        noAudio = noAudio or (info is not None and info["audioCodec"] is None)
+        allowCopy = False
+
+    # 切り抜く場合は常に再エンコードし、以降は切り抜いた後の解像度を出力の解像度とする
+    if crop is not None:
+        resolution = getCroppedResolution(resolution, crop)
+        allowCopy = False
+    if decimate:
+        allowCopy = False
+
+    # 範囲を連結する場合や間引く場合は、区間に分割せずに1回でエンコードする
+    # （間引くと区間の長さが変わり、結合した映像と音声がずれるため）
+    def encodeOutput(encoder: str, plan: dict):
+        if ranges or decimate:
+            return encode(
+                inputPath,
+                outputPath,
+                trimStartPosMs,
+                duration,
+                resolution,
+                framerate,
+                encoder,
+                plan,
+                twoPass,
+                onProgress,
+                cancelEvent,
+                ranges=ranges,
+                crop=crop,
+                decimate=decimate,
+            )
+        chunkCount = getChunkCount(duration, encoder) if parallelEncode else 1
+        return encodeChunked(
+            inputPath,
+            outputPath,
+            trimStartPosMs,
+            duration,
+            resolution,
+            framerate,
+            encoder,
+            plan,
+            twoPass,
+            chunkCount,
+            reuseSegments,
+            onProgress,
+            cancelEvent,
+            crop,
+        )
+
+    # 元動画が出力設定と一致し容量内に収まる場合はストリームコピーする
+    info = probe.probeVideo(inputPath) if allowCopy else None
+    if allowCopy and canStreamCopy(
+        info, duration, resolution, framerate, size, noAudio
+    ):
+        keyframes = keyframeindex.loadKeyframes(inputPath)
+        if isKeyframeAligned(keyframes, trimStartPosMs):
+            method = METHOD_COPY
+            result = streamCopy(
+                inputPath,
+                outputPath,
+                trimStartPosMs,
+                duration,
+                noAudio,
+                onProgress,
+                cancelEvent,
+            )
+        elif hasInnerKeyframes(keyframes, trimStartPosMs, trimEndPosMs):
+            method = METHOD_SMART
+            result = smartRender(
+                inputPath,
+                outputPath,
+                trimStartPosMs,
+                trimEndPosMs,
+                info,
+                keyframes,
+                noAudio,
+                planExport(size, duration, resolution, framerate, noAudio),
+                onProgress,
+                cancelEvent,
+            )
+        else:
+            result = None
+
+        if (
+            result is not None
+            and result.returncode == 0
+            and os.path.getsize(outputPath) <= size * 1024 * 1024
+        ):
+            return result, method
+
+    # 使用可能なエンコーダーを優先順に試す
+    for encoder in encoders.getAvailableEncoders("h264"):
+        plan = planExport(
+            size, duration, resolution, framerate, noAudio, encoder, twoPass
+        )
+        checkPlan(plan)
+        result = encodeOutput(encoder, plan)
+        if result.returncode == 0:
+            break
+
+    # 次回以降の補正のため、計画どおりに出力した結果を記録する
+    # 間引いた出力はフレームが減った分だけ計画より小さくなり、範囲を連結した出力も
+    # 範囲の境界でキーフレームが増えるなど計画との比が異なるため、補正に使わない
+    if result.returncode == 0 and not decimate and not ranges:
+        history.recordExport(
+            encoder,
+            resolution,
+            framerate,
+            twoPass,
+            duration,
+            plan["targetBytes"],
+            plan["plannedBytes"],
+            plan["correction"],
+            os.path.getsize(outputPath),
+        )
+
+    # 2パスモードでは容量を超過した場合のみ、実測値からビットレートを補正して1度だけ再出力する
+    if twoPass and result.returncode == 0:
+        targetSize = size * 1024 * 1024
+        outputSize = os.path.getsize(outputPath)
+        if outputSize > targetSize:
+            # 音声とオーバーヘッドは変わらないため、超過分を映像から減らす
+            excessBytes = outputSize - targetSize * SIZE_MARGIN
+            videoBitRate = plan["videoBitRate"] - excessBytes * 8 / duration
+            plan = dict(
+                plan,
+                videoBitRate=max(int(videoBitRate), budget.MIN_VIDEO_BIT_RATE),
+            )
+            result = encodeOutput(encoder, plan)
+
+    return result, METHOD_ENCODE
 
 
 def exportVideo(
@@ -11,31 +960,356 @@ def exportVideo(
     framerate: int,
     size: int,
     noAudio: bool,
+    twoPass: bool = True,
+    allowCopy: bool = True,
+    parallelEncode: bool = False,
+    reuseSegments: bool = False,
+    ranges: list = None,
+    crop: dict = None,
+    decimate: bool = False,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    startTime = time.perf_counter()
+    error = None
+    try:
+        result, method = renderVideo(
+            inputPath,
+            outputPath,
+            trimStartPosMs,
+            trimEndPosMs,
+            resolution,
+            framerate,
+            size,
+            noAudio,
+            twoPass,
+            allowCopy,
+            parallelEncode,
+            reuseSegments,
+            ranges,
+            crop,
+            decimate,
+            onProgress,
+            cancelEvent,
+        )
+    except (OSError, SizeError) as e:
+        # ffmpegが見つからない場合や、容量に収まらない場合など
+        result = subprocess.CompletedProcess([], 1, "", str(e))
+        method = METHOD_ENCODE
+        error = str(e)
+    elapsed = time.perf_counter() - startTime
+
+    exportResult = buildResult(result, method, outputPath, elapsed, cancelEvent)
+    exportResult["error"] = error
+    if decimate and exportResult["status"] == STATUS_DONE:
+        exportResult["droppedFrames"] = countDroppedFrames(
+            outputPath,
+            getExportDuration(trimStartPosMs, trimEndPosMs, ranges),
+            framerate,
+        )
+    return exportResult
+
+
+# ffmpegの実行結果から出力結果を作成する
+def buildResult(
+    result: subprocess.CompletedProcess,
+    method: str,
+    outputPath: str,
+    elapsed: float,
+    cancelEvent: threading.Event = None,
 ):
+    if cancelEvent is not None and cancelEvent.is_set():
+        status = STATUS_CANCELLED
+    elif result.returncode == 0 and os.path.isfile(outputPath):
+        status = STATUS_DONE
+    else:
+        status = STATUS_FAILED
 
-    duration = round((trimEndPosMs - trimStartPosMs) / 1000, 2)
-    bitRateKB = min(int(size * 850 / duration), 10000)
-    noAudioArg = "-an" if noAudio else ""
+    # キャンセル・失敗時は途中まで書き込まれたファイルを削除する
+    if status != STATUS_DONE:
+        try:
+            os.remove(outputPath)
+        except OSError:
+            pass
 
-    encoder = "h264_nvenc"
+    return {
+        "status": status,
+        "method": method,
+        "process": result,
+        "outputPath": outputPath,
+        "outputSize": os.path.getsize(outputPath) if status == STATUS_DONE else 0,
+        "elapsed": elapsed,
+        # 静止した場面を間引いた場合に取り除いたフレームの数
+        "droppedFrames": 0,
+        # 出力できなかった理由（ffmpegのエラー以外の場合）
+        "error": None,
+    }
 
-    args = f'-ss {round(trimStartPosMs / 1000,2)}  -i "{inputPath}" -t {duration} -s {resolution} -r {framerate} -c:v {encoder} -b:v {bitRateKB}KB {noAudioArg} -y "{outputPath}"'
 
-    result = subprocess.run(
-        f"./ffmpeg {args}",
-        creationflags=subprocess.CREATE_NO_WINDOW,
-        capture_output=True,
-        text=True,
-    )
+# 1回のデコードから複数の出力先に分岐するフィルターグラフを作成する
+# 同じ解像度の出力はスケーリングも共有し、各出力の映像は[v0], [v1], ...とする
+# 切り抜く場合は分岐の前に1度だけ切り抜き、間引く場合は出力ごとのフレームレートで間引く
+def buildSplitFilter(
+    targets: list, encoder: str, crop: dict = None, decimate: bool = False
+):
+    resolutions = list(dict.fromkeys(target["resolution"] for target in targets))
+    graph = [
+        "[0:v]{}split={}{}".format(
+            "" if crop is None else buildScaleFilters(resolutions[0], crop)[0] + ",",
+            len(resolutions),
+            "".join("[s{}]".format(i) for i in range(len(resolutions))),
+        )
+    ]
+    for i, resolution in enumerate(resolutions):
+        indexes = [
+            index
+            for index, target in enumerate(targets)
+            if target["resolution"] == resolution
+        ]
+        graph.append(
+            "[s{}]scale={},split={}{}".format(
+                i,
+                resolution.replace("x", ":"),
+                len(indexes),
+                "".join("[r{}]".format(index) for index in indexes),
+            )
+        )
+    for index, target in enumerate(targets):
+        if decimate:
+            filters = buildDecimateFilters(target["frameRate"])
+        else:
+            filters = ["fps={}".format(target["frameRate"])]
+        filters += encoders.getFilters(encoder)
+        graph.append("[r{}]{}[v{}]".format(index, ",".join(filters), index))
+    return ";".join(graph)
+
+
+# 1回のデコードで複数の出力をエンコードする
+# targetsは {"outputPath", "resolution", "frameRate", "size"} の辞書のリストで、
+# plansは各出力のビットレートの計画
+def encodeMultiple(
+    inputPath: str,
+    trimStartPosMs: int,
+    duration: float,
+    targets: list,
+    encoder: str,
+    plans: list,
+    twoPass: bool,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+    crop: dict = None,
+    decimate: bool = False,
+):
+    # 全ての出力に適用されるよう、長さは入力側で指定する
+    args = encoders.getInputArgs(encoder)
+    args += ["-ss", str(trimStartPosMs / 1000), "-t", str(duration), "-i", inputPath]
+    args += ["-filter_complex", buildSplitFilter(targets, encoder, crop, decimate)]
+    args += ["-y"]
+
+    # audioArgsを指定した場合は音声をその設定で出力する
+    def outputArgs(index: int, extraArgs: list, outputPath: str, audioArgs=None):
+        plan = plans[index]
+        outputArgs = ["-map", "[v{}]".format(index)]
+        if decimate:
+            outputArgs += buildFrameRateArgs(targets[index]["frameRate"], decimate)
+        outputArgs += buildCodecArgs(encoder, plan["videoBitRate"], twoPass)
+        outputArgs += extraArgs
+        if plan["audioCodec"] is not None:
+            outputArgs += ["-map", "0:a?"] + (audioArgs or buildAudioArgs(plan))
+        else:
+            outputArgs += ["-an"]
+        return outputArgs + [outputPath]
 
+    rateControlArgs = []
+    # NVENCはエンコーダー内部の2パスを使用する
+    if twoPass and encoder == "h264_nvenc":
+        rateControlArgs = ["-rc", "vbr", "-multipass", "fullres"]
+
+    # 2パスに対応していないエンコーダーは最大ビットレートの制限のみで出力する
+    if not twoPass or encoder not in TWO_PASS_ENCODERS:
+        for index, target in enumerate(targets):
+            args += outputArgs(index, rateControlArgs, target["outputPath"])
+        return probe.runFFmpeg(args, duration, onProgress, cancelEvent)
+
+    # 1パス目で全ての出力の解析を行い、2パス目で目標ビットレートに合わせて出力する
+    # 解析結果のファイル名には出力全体でのストリームの番号が付くため、
+    # 1パス目も音声を（エンコードせずに）含め、2パス目とストリームの並びを揃える
+    passLogDir = tempfile.mkdtemp(prefix="To25_")
+    try:
+        passLogFiles = [
+            os.path.join(passLogDir, "pass{}".format(index))
+            for index in range(len(targets))
+        ]
+        firstPassArgs = list(args)
+        for index in range(len(targets)):
+            firstPassArgs += outputArgs(
+                index,
+                ["-pass", "1", "-passlogfile", passLogFiles[index], "-f", "null"],
+                os.devnull,
+                ["-c:a", "copy"],
+            )
+        result = probe.runFFmpeg(
+            firstPassArgs, duration, stageProgress(onProgress, 0, 2), cancelEvent
+        )
+        if result.returncode != 0:
+            return result
+
+        for index, target in enumerate(targets):
+            args += outputArgs(
+                index,
+                ["-pass", "2", "-passlogfile", passLogFiles[index]],
+                target["outputPath"],
+            )
+        return probe.runFFmpeg(
+            args, duration, stageProgress(onProgress, 1, 2), cancelEvent
+        )
+    finally:
+        shutil.rmtree(passLogDir, ignore_errors=True)
+
+
+# 複数の出力を1回のデコードで再エンコードし、出力ごとに最後に実行したffmpegの結果を返す
+def renderMultiple(
+    inputPath: str,
+    targets: list,
+    trimStartPosMs: int,
+    trimEndPosMs: int,
+    noAudio: bool,
+    twoPass: bool = True,
+    crop: dict = None,
+    decimate: bool = False,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    duration = getExportDuration(trimStartPosMs, trimEndPosMs)
+    if crop is not None:
+        targets = [
+            dict(target, resolution=getCroppedResolution(target["resolution"], crop))
+            for target in targets
+        ]
+
+    # 使用可能なエンコーダーを優先順に試す
+    for encoder in encoders.getAvailableEncoders("h264"):
+        plans = [
+            planExport(
+                target["size"],
+                duration,
+                target["resolution"],
+                target["frameRate"],
+                noAudio,
+                encoder,
+                twoPass,
+            )
+            for target in targets
+        ]
+        for plan in plans:
+            checkPlan(plan)
+        result = encodeMultiple(
+            inputPath,
+            trimStartPosMs,
+            duration,
+            targets,
+            encoder,
+            plans,
+            twoPass,
+            onProgress,
+            cancelEvent,
+            crop,
+            decimate,
+        )
+        if result.returncode == 0:
+            break
+
+    results = [result] * len(targets)
     if result.returncode != 0:
-        encoder = "h264"
-        args = f'-ss {round(trimStartPosMs / 1000,2)}  -i "{inputPath}" -t {duration} -s {resolution} -r {framerate} -c:v {encoder} -b:v {bitRateKB}KB {noAudioArg} -y "{outputPath}"'
-        result = subprocess.run(
-            f"./ffmpeg {args}",
-            creationflags=subprocess.CREATE_NO_WINDOW,
-            capture_output=True,
-            text=True,
+        return results
+
+    for index, (target, plan) in enumerate(zip(targets, plans)):
+        outputSize = os.path.getsize(target["outputPath"])
+        if not decimate:
+            history.recordExport(
+                encoder,
+                target["resolution"],
+                target["frameRate"],
+                twoPass,
+                duration,
+                plan["targetBytes"],
+                plan["plannedBytes"],
+                plan["correction"],
+                outputSize,
+            )
+
+        # 2パスモードでは容量を超過した出力のみ、個別に再出力する
+        targetSize = target["size"] * 1024 * 1024
+        if not twoPass or outputSize <= targetSize:
+            continue
+        excessBytes = outputSize - targetSize * SIZE_MARGIN
+        videoBitRate = plan["videoBitRate"] - excessBytes * 8 / duration
+        plan = dict(
+            plan, videoBitRate=max(int(videoBitRate), budget.MIN_VIDEO_BIT_RATE)
+        )
+        results[index] = encode(
+            inputPath,
+            target["outputPath"],
+            trimStartPosMs,
+            duration,
+            target["resolution"],
+            target["frameRate"],
+            encoder,
+            plan,
+            twoPass,
+            None,
+            cancelEvent,
+            crop=crop,
+            decimate=decimate,
         )
 
-    return result
+    return results
+
+
+# 同じ範囲を複数の容量・解像度・フレームレートで出力し、出力ごとの結果のリストを返す
+def exportMultiple(
+    inputPath: str,
+    targets: list,
+    trimStartPosMs: int,
+    trimEndPosMs: int,
+    noAudio: bool,
+    twoPass: bool = True,
+    crop: dict = None,
+    decimate: bool = False,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    startTime = time.perf_counter()
+    error = None
+    try:
+        results = renderMultiple(
+            inputPath,
+            targets,
+            trimStartPosMs,
+            trimEndPosMs,
+            noAudio,
+            twoPass,
+            crop,
+            decimate,
+            onProgress,
+            cancelEvent,
+        )
+    except (OSError, SizeError) as e:
+        results = [subprocess.CompletedProcess([], 1, "", str(e))] * len(targets)
+        error = str(e)
+    elapsed = time.perf_counter() - startTime
+
+    exportResults = [
+        buildResult(result, METHOD_ENCODE, target["outputPath"], elapsed, cancelEvent)
+        for target, result in zip(targets, results)
+    ]
+    for exportResult in exportResults:
+        exportResult["error"] = error
+    if decimate:
+        duration = getExportDuration(trimStartPosMs, trimEndPosMs)
+        for target, exportResult in zip(targets, exportResults):
+            if exportResult["status"] == STATUS_DONE:
+                exportResult["droppedFrames"] = countDroppedFrames(
+                    target["outputPath"], duration, target["frameRate"]
+                )
+    return exportResults
@@ -0,0 +1,81 @@
+import numpy as np
+
+import waveform
+
+# 音量を計算する区間の長さ（秒）
+WINDOW_SECONDS = 1
+# 盛り上がりの判定に使う短期・長期の移動平均の長さ（区間数）
+SHORT_WINDOWS = 3
+LONG_WINDOWS = 30
+
+# 候補の範囲（音量のピークの前後の秒数）
+# 盛り上がる場面は大きな音の直前から始まることが多いため、前側を長くする
+SECONDS_BEFORE_PEAK = 15
+SECONDS_AFTER_PEAK = 5
+
+HIGHLIGHT_COUNT = 5
+
+# 無音の区間のlog計算を避けるための下限
+MIN_ENERGY = 1e-10
+
+
+# 波形のブロックごとのRMSから、区間ごとの音量（dB）を計算する
+def computeLoudness(blocks: np.ndarray):
+    blocksPerWindow = int(
+        waveform.SAMPLE_RATE / waveform.BLOCK_SAMPLES * WINDOW_SECONDS
+    )
+    energy = blocks[:, waveform.COLUMN_RMS].astype(np.float64) ** 2
+    # 最後の端数は切り捨てずに短い区間として扱う
+    padding = -len(energy) % blocksPerWindow
+    counts = np.full(
+        (len(energy) + padding) // blocksPerWindow, blocksPerWindow, dtype=np.float64
+    )
+    counts[-1] -= padding
+    energy = np.pad(energy, (0, padding)).reshape(-1, blocksPerWindow)
+    return 10 * np.log10(np.maximum(energy.sum(axis=1) / counts, MIN_ENERGY))
+
+
+def movingAverage(values: np.ndarray, length: int):
+    length = max(1, min(length, len(values)))
+    kernel = np.ones(length) / length
+    # 端は実際に平均した区間数で割る
+    weights = np.convolve(np.ones(len(values)), kernel, mode="same")
+    return np.convolve(values, kernel, mode="same") / weights
+
+
+# 音量が大きく、周囲より急に大きくなった場面を候補として返す
+# 戻り値は {"start", "end", "peak"}（ミリ秒）と"score"の辞書のリスト（スコア順）
+def findHighlights(blocks: np.ndarray, durationMs: int, count=HIGHLIGHT_COUNT):
+    if blocks is None or len(blocks) == 0 or durationMs <= 0:
+        return []
+
+    loudness = computeLoudness(blocks)
+    short = movingAverage(loudness, SHORT_WINDOWS)
+    long = movingAverage(loudness, LONG_WINDOWS)
+    # 音量そのものと、長期平均からの上昇量の両方を評価する
+    scores = short + np.maximum(short - long, 0)
+
+    rangeMs = (SECONDS_BEFORE_PEAK + SECONDS_AFTER_PEAK) * 1000
+    windowMs = WINDOW_SECONDS * 1000
+    highlights = []
+    # 既に選んだ候補と範囲が重ならないものをスコアの高い順に選ぶ
+    for index in np.argsort(scores)[::-1].tolist():
+        peakMs = min(int((index + 0.5) * windowMs), durationMs)
+        if any(abs(peakMs - h["peak"]) < rangeMs for h in highlights):
+            continue
+
+        startMs = max(peakMs - SECONDS_BEFORE_PEAK * 1000, 0)
+        endMs = min(startMs + rangeMs, durationMs)
+        startMs = max(endMs - rangeMs, 0)
+        highlights.append(
+            {
+                "start": startMs,
+                "end": endMs,
+                "peak": peakMs,
+                "score": float(scores[index]),
+            }
+        )
+        if len(highlights) >= count:
+            break
+
+    return highlights
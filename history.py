@@ -0,0 +1,106 @@
+import sqlite3
+import statistics
+import time
+
+import settings
+
+historyFilePath = settings.settingFolderPath / "history.sqlite3"
+
+# 補正係数の計算に使う直近の出力の数と、補正を始める最小の数
+RECENT_EXPORT_COUNT = 20
+MIN_EXPORT_COUNT = 3
+
+# 補正係数の範囲（内容が単純で容量が余った出力で、ビットレートを上げすぎないようにする）
+MIN_CORRECTION = 0.7
+MAX_CORRECTION = 1.1
+
+
+def connect(path=None):
+    connection = sqlite3.connect(str(path or historyFilePath), timeout=5)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS exports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            createdAt REAL NOT NULL,
+            encoder TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            frameRate INTEGER NOT NULL,
+            twoPass INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            targetBytes INTEGER NOT NULL,
+            plannedBytes INTEGER NOT NULL,
+            correction REAL NOT NULL,
+            outputBytes INTEGER NOT NULL
+        )
+        """)
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS exportsByEncoder"
+        " ON exports (encoder, resolution, twoPass, id)"
+    )
+    return connection
+
+
+# 再エンコードした出力の結果を記録する（記録に失敗しても出力には影響させない）
+def recordExport(
+    encoder: str,
+    resolution: str,
+    framerate: int,
+    twoPass: bool,
+    duration: float,
+    targetBytes: int,
+    plannedBytes: int,
+    correction: float,
+    outputBytes: int,
+    path=None,
+):
+    try:
+        connection = connect(path)
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT INTO exports (createdAt, encoder, resolution, frameRate,"
+                    " twoPass, duration, targetBytes, plannedBytes, correction,"
+                    " outputBytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        time.time(),
+                        encoder,
+                        resolution,
+                        framerate,
+                        int(twoPass),
+                        duration,
+                        targetBytes,
+                        plannedBytes,
+                        correction,
+                        outputBytes,
+                    ),
+                )
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        pass
+
+
+# 出力の容量がビットレートに比例するとみなし、直近の出力で
+# 計画した容量どおりに出力するための補正係数の中央値を返す（記録が少ない場合は1.0）
+def getCorrectionFactor(encoder: str, resolution: str, twoPass: bool, path=None):
+    try:
+        connection = connect(path)
+        try:
+            rows = connection.execute(
+                "SELECT plannedBytes, correction, outputBytes FROM exports"
+                " WHERE encoder = ? AND resolution = ? AND twoPass = ?"
+                " ORDER BY id DESC LIMIT ?",
+                (encoder, resolution, int(twoPass), RECENT_EXPORT_COUNT),
+            ).fetchall()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return 1.0
+
+    ratios = [
+        planned * correction / output
+        for planned, correction, output in rows
+        if output > 0
+    ]
+    if len(ratios) < MIN_EXPORT_COUNT:
+        return 1.0
+    return min(max(statistics.median(ratios), MIN_CORRECTION), MAX_CORRECTION)
@@ -0,0 +1,66 @@
+import bisect
+import json
+import math
+import os
+
+import diskcache
+import probe
+import settings
+
+keyframeFolderPath = settings.settingFolderPath / "keyframes"
+keyframeFolderPath.mkdir(parents=True, exist_ok=True)
+
+# キーフレームのキャッシュの上限（バイト）
+MAX_CACHE_BYTES = 20 * 1024 * 1024
+
+
+def getCachePath(sourceKey: str):
+    return keyframeFolderPath / (diskcache.hashKey(sourceKey) + ".json")
+
+
+# 動画全体のキーフレームの時刻（秒）を取得する（キャッシュがあればそれを使う）
+def loadKeyframes(path: str):
+    sourceKey = diskcache.getSourceKey(path)
+    if sourceKey is None:
+        return []
+
+    cachePath = getCachePath(sourceKey)
+    if cachePath.exists() and diskcache.touch(cachePath):
+        try:
+            with open(cachePath, "r", encoding="utf-8") as f:
+                return json.load(f)["keyframes"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    keyframes = probe.getKeyframes(path)
+    # 取得に失敗した場合は次回に再取得する
+    if keyframes:
+        tempPath = str(cachePath) + ".tmp"
+        try:
+            with open(tempPath, "w", encoding="utf-8") as f:
+                json.dump({"keyframes": keyframes}, f)
+            os.replace(tempPath, cachePath)
+        except OSError:
+            pass
+        diskcache.evictCache(keyframeFolderPath, MAX_CACHE_BYTES)
+    return keyframes
+
+
+# 指定位置（ミリ秒）に最も近いキーフレームの時刻（秒）を返す
+def findNearestKeyframe(keyframes: list, positionMs: int):
+    if not keyframes:
+        return None
+    positionSec = positionMs / 1000
+    index = bisect.bisect_left(keyframes, positionSec)
+    candidates = keyframes[max(0, index - 1) : index + 1]
+    return min(candidates, key=lambda k: abs(k - positionSec))
+
+
+# 指定位置を最も近いキーフレームに合わせる（キーフレームが無い場合はそのまま）
+# -ssでキーフレームより前の位置を指定すると1つ前のキーフレームから始まるため、
+# ミリ秒への変換は切り上げる
+def snapToKeyframe(keyframes: list, positionMs: int):
+    keyframe = findNearestKeyframe(keyframes, positionMs)
+    if keyframe is None:
+        return positionMs
+    return math.ceil(round(keyframe * 1000, 3))
@@ -8,12 +8,19 @@ import webbrowser
 from PyQt6.QtCore import (
     QCoreApplication,
     QEvent,
+    QFileSystemWatcher,
+    QObject,
     QPoint,
+    QPointF,
+    QRect,
     QRectF,
     QSize,
     QStandardPaths,
     Qt,
+    QThread,
+    QTimer,
     QUrl,
+    pyqtSignal,
 )
 from PyQt6.QtGui import (
     QBrush,
@@ -23,7 +30,6 @@ from PyQt6.QtGui import (
     QMouseEvent,
     QPainter,
     QPalette,
-    QPen,
     QPixmap,
 )
 from PyQt6.QtMultimedia import QAudioOutput, QMediaDevices, QMediaFormat, QMediaPlayer
@@ -39,23 +45,37 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QLineEdit,
+    QListWidget,
     QMainWindow,
     QMessageBox,
     QProgressBar,
     QPushButton,
     QRadioButton,
+    QRubberBand,
     QSizePolicy,
     QSlider,
     QSpacerItem,
     QSpinBox,
     QStyle,
+    QTableWidget,
+    QTableWidgetItem,
+    QToolTip,
     QVBoxLayout,
     QWidget,
 )
 
 import autoload
 import expoter
+import exportqueue
+import highlight
+import keyframeindex
+import predictor
+import probe
+import proxy
+import seekbarrenderer
 import settings
+import thumbnail
+import waveform
 
 BUTTON_SIZE = 40
 WINDOW_WIDTH = 1280
@@ -63,6 +83,37 @@ WINDOW_HEIGHT = 900
 
 VERSION = "1.0.1"
 
+# 新しいクリップの書き込み完了を確認する間隔（ミリ秒）と、サイズが変化しない回数
+CLIP_SETTLE_INTERVAL_MS = 1000
+CLIP_SETTLE_COUNT = 2
+# フォルダを監視できない場合にポーリングする間隔（ミリ秒）
+CLIP_POLL_INTERVAL_MS = 5000
+
+SEEKBAR_HEIGHT = 40
+# 切り抜く範囲の最小の幅・高さ（元動画のピクセル、これより小さいドラッグは解除とみなす）
+MIN_CROP_SIZE = 16
+# サムネイルの上でも読めるよう時間表示に半透明の背景を付ける
+SEEKBAR_LABEL_STYLE = "background-color: rgba(255, 255, 255, 180); border-radius: 3px;"
+# 画面のリフレッシュレートが取得できない場合に使う値
+DEFAULT_REFRESH_RATE = 60
+
+# 出力の進捗バーの分解能
+EXPORT_PROGRESS_MAX = 1000
+
+EXPORT_JOB_STATUS_TEXT = {
+    exportqueue.JOB_WAITING: "待機中",
+    exportqueue.JOB_RUNNING: "出力中",
+    expoter.STATUS_DONE: "完了",
+    expoter.STATUS_CANCELLED: "キャンセル",
+    expoter.STATUS_FAILED: "失敗",
+}
+
+EXPORT_METHOD_TEXT = {
+    expoter.METHOD_COPY: "無劣化コピー（再エンコードなし）",
+    expoter.METHOD_SMART: "スマートレンダリング（切り取り位置のみ再エンコード）",
+    expoter.METHOD_ENCODE: "再エンコード",
+}
+
 
 class PlayButton(QPushButton):
     def keyPressEvent(self, event: QKeyEvent):
@@ -84,6 +135,13 @@ class MainWidget(QWidget):
 
         self.settings = setting
 
+        # 出力キュー（ジョブの変化はシグナルでUIスレッドに通知する）
+        self.queueNotifier = ExportQueueNotifier()
+        self.exportQueue = exportqueue.ExportQueue(
+            self.settings.settings["exportWorkers"],
+            self.queueNotifier.jobChanged.emit,
+        )
+
         # UIの初期化
         self.setUpUI()
         self.setAcceptDrops(True)
@@ -232,6 +290,7 @@ class MainWidget(QWidget):
             volumeSlider=volumeSlider,
             muteBtn=muteBtn,
         )
+        self.mediaPlayer.useProxy = self.settings.settings["useProxy"]
 
         self.videowidget = CustomVideoWidget(mediaPlayer=self.mediaPlayer)
         self.videowidget.setFixedSize(1280, 720)
@@ -277,13 +336,23 @@ class MainWidget(QWidget):
             url = event.mimeData().urls()[0]
             self.mediaPlayer.startPlay(url)
 
+    # 範囲を追加している場合は、追加した範囲を連結して出力する
     def openExportWindow(self):
         self.stopEditing()
+        ranges = self.mediaPlayer.trimRanges
+        if ranges:
+            trimStartPositon, trimEndPositon = ranges[0][0], ranges[-1][1]
+        else:
+            trimStartPositon = self.mediaPlayer.trimStartPositon
+            trimEndPositon = self.mediaPlayer.trimEndPositon
         exportWindow = ExportWindow(
             self.settings,
-            self.mediaPlayer.source().toString().replace("file:///", ""),
-            self.mediaPlayer.trimStartPositon,
-            self.mediaPlayer.trimEndPositon,
+            self.mediaPlayer.sourcePath,
+            trimStartPositon,
+            trimEndPositon,
+            self.exportQueue,
+            list(ranges) if len(ranges) > 1 else None,
+            self.mediaPlayer.crop,
         )
         exportWindow.exec()
 
@@ -347,9 +416,30 @@ class SettingWindow(QDialog):
             "ソフト起動時に動画フォルダ内の最近録画されたクリップを自動再生します"
         )
 
+        exportWorkersLabel = QLabel("同時出力数")
+        exportWorkersLabel.setToolTip(
+            "出力キューで同時にエンコードする動画の数です。少ないほどゲームなどへの影響が小さくなります。"
+        )
+        self.exportWorkersSpinBox = QSpinBox()
+        self.exportWorkersSpinBox.setRange(1, os.cpu_count() or 1)
+        self.exportWorkersSpinBox.setValue(self.settings.settings["exportWorkers"])
+
+        exportWorkersLayout = QHBoxLayout()
+        exportWorkersLayout.addWidget(exportWorkersLabel)
+        exportWorkersLayout.addWidget(self.exportWorkersSpinBox)
+        exportWorkersLayout.addStretch()
+
+        self.useProxy = QCheckBox("高解像度の動画はプロキシで再生")
+        self.useProxy.setChecked(self.settings.settings["useProxy"])
+        self.useProxy.setToolTip(
+            "1440p以上や高ビットレートの動画を開いたときに、低解像度のコピーをバックグラウンドで作成して再生に使用します。出力には元の動画が使用されます。"
+        )
+
         baseSettingsLayout = QVBoxLayout()
         baseSettingsLayout.addWidget(self.autoClipPlay)
         baseSettingsLayout.addWidget(self.openFolderAfterExport)
+        baseSettingsLayout.addWidget(self.useProxy)
+        baseSettingsLayout.addLayout(exportWorkersLayout)
 
         # 設定保存ボタン
         saveButton = QPushButton("保存")
@@ -383,11 +473,22 @@ class SettingWindow(QDialog):
         self.settings.settings["defaultOptions"]["frameRate"] = output["frameRate"]
         self.settings.settings["defaultOptions"]["size"] = output["size"]
         self.settings.settings["defaultOptions"]["noAudio"] = output["noAudio"]
+        self.settings.settings["defaultOptions"]["twoPass"] = output["twoPass"]
+        self.settings.settings["defaultOptions"]["allowCopy"] = output["allowCopy"]
+        self.settings.settings["defaultOptions"]["parallelEncode"] = output[
+            "parallelEncode"
+        ]
+        self.settings.settings["defaultOptions"]["reuseSegments"] = output[
+            "reuseSegments"
+        ]
+        self.settings.settings["defaultOptions"]["decimate"] = output["decimate"]
 
         self.settings.settings["autoPlayClip"] = self.autoClipPlay.isChecked()
         self.settings.settings["openFolderAfterExport"] = (
             self.openFolderAfterExport.isChecked()
         )
+        self.settings.settings["exportWorkers"] = self.exportWorkersSpinBox.value()
+        self.settings.settings["useProxy"] = self.useProxy.isChecked()
         self.settings.settings["clipPath"] = self.clipPathEdit.text()
         self.settings.settings["outputPath"] = (
             self.outputSettingLayout.outputPathEdit.text()
@@ -423,6 +524,9 @@ class Window(QMainWindow):
 
         self.mainWidget = MainWidget(self.settings)
         self.setCentralWidget(self.mainWidget)
+        self.mainWidget.queueNotifier.jobChanged.connect(self.handleExportJobChanged)
+        self.exportQueueWindow = None
+        self.clipWatcher = None
 
         # メニューバーの設定
         self.setupMenuBar()
@@ -439,6 +543,10 @@ class Window(QMainWindow):
             welcomeWindow.exec()
             self.showSettings()
 
+        # クリップフォルダを監視し、最新のクリップを常に把握する
+        self.clipWatcher = ClipWatcher(self.settings.settings["clipPath"])
+        self.clipWatcher.clipAdded.connect(self.handleClipAdded)
+
         self.autoLoadClip()
 
     # メニューバーの設定
@@ -453,10 +561,20 @@ class Window(QMainWindow):
         openFileAction.triggered.connect(self.open)
         openFileAction.setShortcut("o")
 
+        # 最新のクリップを開く
+        openNewestAction = fileMenu.addAction("最新のクリップを開く")
+        openNewestAction.triggered.connect(self.openNewestClip)
+        openNewestAction.setShortcut("n")
+
         # ファイルを保存
         saveFileAction = fileMenu.addAction("保存")
         saveFileAction.triggered.connect(self.mainWidget.openExportWindow)
 
+        # 出力キュー
+        queueAction = fileMenu.addAction("出力キュー")
+        queueAction.triggered.connect(self.showExportQueue)
+        queueAction.setShortcut("q")
+
         # 終了
         fileMenu.addSeparator()
         exitAction = fileMenu.addAction("終了")
@@ -470,6 +588,41 @@ class Window(QMainWindow):
         )
         toggleRepeatWithinTrimming.setShortcut("r")
 
+        # トリミング位置をキーフレームに合わせる（無劣化コピーで出力しやすくなる）
+        snapToKeyframeAction = editMenu.addAction(
+            "トリミング位置をキーフレームに合わせる"
+        )
+        snapToKeyframeAction.setCheckable(True)
+        snapToKeyframeAction.setChecked(self.settings.settings["snapToKeyframe"])
+        snapToKeyframeAction.toggled.connect(self.setSnapToKeyframe)
+        snapToKeyframeAction.setShortcut("k")
+
+        # 音量から見つけた盛り上がりの候補をトリミング範囲に設定する
+        applyHighlightAction = editMenu.addAction("次のハイライト候補を適用")
+        applyHighlightAction.triggered.connect(self.applyNextHighlight)
+        applyHighlightAction.setShortcut("h")
+
+        # 複数のトリミング範囲を連結して1つの動画として出力する
+        addTrimRangeAction = editMenu.addAction("トリミング範囲を追加")
+        addTrimRangeAction.triggered.connect(self.addTrimRange)
+        addTrimRangeAction.setShortcut("a")
+        clearTrimRangesAction = editMenu.addAction("追加した範囲を消去")
+        clearTrimRangesAction.triggered.connect(self.clearTrimRanges)
+        clearTrimRangesAction.setShortcut("Shift+A")
+
+        # 動画上をドラッグした範囲を切り抜いて出力する
+        cropModeAction = editMenu.addAction("切り抜く範囲を指定")
+        cropModeAction.setCheckable(True)
+        cropModeAction.toggled.connect(self.setCropMode)
+        cropModeAction.setShortcut("c")
+        clearCropAction = editMenu.addAction("切り抜きを解除")
+        clearCropAction.triggered.connect(self.clearCrop)
+        clearCropAction.setShortcut("Shift+C")
+        self.mainWidget.videowidget.cropChanged.connect(self.handleCropChanged)
+        self.mainWidget.mediaPlayer.snapToKeyframe = self.settings.settings[
+            "snapToKeyframe"
+        ]
+
         # 設定
         editMenu.addSeparator()
         openSettingsAction = editMenu.addAction("設定")
@@ -507,6 +660,142 @@ class Window(QMainWindow):
         self.mainWidget.stopEditing()
         settingWindow = SettingWindow(self.settings)
         settingWindow.exec()
+        self.mainWidget.exportQueue.setWorkerCount(
+            self.settings.settings["exportWorkers"]
+        )
+        self.mainWidget.mediaPlayer.useProxy = self.settings.settings["useProxy"]
+        if (
+            self.clipWatcher is not None
+            and self.clipWatcher.clipPath != self.settings.settings["clipPath"]
+        ):
+            self.clipWatcher.setClipPath(self.settings.settings["clipPath"])
+
+    def openNewestClip(self):
+        clip = self.clipWatcher.newestClip()
+        if clip:
+            self.mainWidget.mediaPlayer.startPlay(QUrl.fromLocalFile(clip))
+            self.statusBar().showMessage("最新のクリップを開きました - " + clip, 5000)
+        else:
+            self.statusBar().showMessage("クリップが見つかりませんでした。", 5000)
+
+    def handleClipAdded(self, clip: str):
+        self.statusBar().showMessage(
+            "新しいクリップが保存されました（nキーで開く） - " + clip, 10000
+        )
+
+    def setSnapToKeyframe(self, checked: bool):
+        self.mainWidget.mediaPlayer.snapToKeyframe = checked
+        self.settings.settings["snapToKeyframe"] = checked
+        self.settings.save()
+        if checked:
+            message = "トリミング位置をキーフレームに合わせます"
+        else:
+            message = "トリミング位置をキーフレームに合わせません"
+        self.statusBar().showMessage(message, 3000)
+
+    def applyNextHighlight(self):
+        mediaPlayer = self.mainWidget.mediaPlayer
+        candidate = mediaPlayer.applyNextHighlight()
+        if candidate is None:
+            self.statusBar().showMessage(
+                "ハイライト候補がありません（音声の解析が終わっていないか、音声がありません）",
+                5000,
+            )
+            return
+        self.statusBar().showMessage(
+            "ハイライト候補 {}/{} を適用しました（{}～{}）".format(
+                mediaPlayer.highlightIndex + 1,
+                len(mediaPlayer.highlights),
+                time.strftime("%H:%M:%S", time.gmtime(candidate["start"] / 1000)),
+                time.strftime("%H:%M:%S", time.gmtime(candidate["end"] / 1000)),
+            ),
+            5000,
+        )
+
+    def addTrimRange(self):
+        mediaPlayer = self.mainWidget.mediaPlayer
+        if not mediaPlayer.addTrimRange():
+            return
+        totalMs = sum(end - start for start, end in mediaPlayer.trimRanges)
+        self.statusBar().showMessage(
+            "トリミング範囲を追加しました（{}個の範囲、合計 {}）".format(
+                len(mediaPlayer.trimRanges),
+                time.strftime("%H:%M:%S", time.gmtime(totalMs / 1000)),
+            ),
+            5000,
+        )
+
+    def clearTrimRanges(self):
+        self.mainWidget.mediaPlayer.clearTrimRanges()
+        self.statusBar().showMessage("追加した範囲を消去しました", 3000)
+
+    def setCropMode(self, checked: bool):
+        self.mainWidget.videowidget.isCropMode = checked
+        if checked:
+            message = "動画上をドラッグして切り抜く範囲を指定します"
+        else:
+            message = "切り抜く範囲の指定を終了しました"
+        self.statusBar().showMessage(message, 3000)
+
+    def clearCrop(self):
+        self.mainWidget.mediaPlayer.crop = None
+        self.handleCropChanged()
+
+    def handleCropChanged(self):
+        self.mainWidget.videowidget.updateCropBand()
+        crop = self.mainWidget.mediaPlayer.crop
+        if crop is None:
+            self.statusBar().showMessage("切り抜きを解除しました", 3000)
+        else:
+            self.statusBar().showMessage(
+                "切り抜く範囲を設定しました（{}x{}）".format(
+                    crop["width"], crop["height"]
+                ),
+                5000,
+            )
+
+    # 切り抜く範囲の枠はトップレベルで表示しているため、ウィンドウに合わせて動かす
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.mainWidget.videowidget.updateCropBand()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.WindowStateChange:
+            self.mainWidget.videowidget.updateCropBand()
+
+    # 出力キューは編集を続けられるようにモードレスで表示する
+    def showExportQueue(self):
+        if self.exportQueueWindow is None:
+            self.exportQueueWindow = ExportQueueWindow(
+                self.mainWidget.exportQueue, self.mainWidget.queueNotifier
+            )
+        self.exportQueueWindow.show()
+        self.exportQueueWindow.raise_()
+
+    def handleExportJobChanged(self, job):
+        if job is None or job["status"] not in exportqueue.FINISHED_STATUSES:
+            return
+        if job["status"] == expoter.STATUS_DONE:
+            self.statusBar().showMessage("出力が完了しました - " + job["name"], 5000)
+        elif job["status"] == expoter.STATUS_FAILED:
+            self.statusBar().showMessage("出力に失敗しました - " + job["name"], 5000)
+
+    def closeEvent(self, event):
+        if self.mainWidget.exportQueue.hasActiveJobs():
+            answer = QMessageBox.question(
+                self,
+                "終了",
+                "出力キューに未完了のジョブがあります。中断して終了しますか？",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+
+        self.mainWidget.exportQueue.shutdown()
+        if self.exportQueueWindow is not None:
+            self.exportQueueWindow.close()
+        super().closeEvent(event)
 
     def openHelp(self):
         self.mainWidget.stopEditing()
@@ -514,7 +803,7 @@ class Window(QMainWindow):
 
     def autoLoadClip(self):
         if self.settings.settings["autoPlayClip"]:
-            clip = autoload.getRecentClip(self.settings.settings["clipPath"])
+            clip = self.clipWatcher.getRecentClip()
             if clip:
                 self.mainWidget.mediaPlayer.startPlay(QUrl.fromLocalFile(clip))
                 self.statusBar().showMessage(
@@ -531,6 +820,148 @@ class Window(QMainWindow):
             self.open()
 
 
+# クリップフォルダを監視し、動画ファイルを新しい順に保持する
+# QFileSystemWatcherで監視できないフォルダは定期的に更新日時を確認する
+class ClipWatcher(QObject):
+    clipAdded = pyqtSignal(str)
+
+    def __init__(self, clipPath: str, maxDepth=5):
+        super().__init__()
+
+        self.maxDepth = maxDepth
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.handleDirectoryChanged)
+
+        self.pollTimer = QTimer(self)
+        self.pollTimer.setInterval(CLIP_POLL_INTERVAL_MS)
+        self.pollTimer.timeout.connect(self.pollDirectories)
+
+        self.settleTimer = QTimer(self)
+        self.settleTimer.setInterval(CLIP_SETTLE_INTERVAL_MS)
+        self.settleTimer.timeout.connect(self.checkPendingClips)
+
+        self.setClipPath(clipPath)
+
+    def setClipPath(self, clipPath: str):
+        self.clipPath = clipPath
+        entries, dirDepths = autoload.scanClipFolder(clipPath, self.maxDepth)
+
+        # [パス, 作成日時] を新しい順に保持する
+        self.clips = sorted(entries, key=lambda entry: entry[1], reverse=True)
+        self.knownFiles = {entry[0] for entry in entries}
+        # 書き込み中のファイル {パス: [前回のサイズ, サイズが変化しなかった回数]}
+        self.pendingClips = {}
+        self.dirDepths = {}
+        self.pollDirMtimes = {}
+
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.pollTimer.stop()
+        self.settleTimer.stop()
+
+        for dirPath, depth in dirDepths.items():
+            self.addDirectory(dirPath, depth)
+
+    def addDirectory(self, dirPath: str, depth: int):
+        self.dirDepths[dirPath] = depth
+        if not self.watcher.addPath(dirPath):
+            try:
+                self.pollDirMtimes[dirPath] = os.stat(dirPath).st_mtime
+            except OSError:
+                return
+            self.pollTimer.start()
+
+    def newestClip(self):
+        if not self.clips:
+            return None
+        return self.clips[0][0]
+
+    def getRecentClip(self):
+        if self.clips and autoload.isRecentClip(self.clips[0][1]):
+            return self.clips[0][0]
+        return None
+
+    # フォルダ内のファイルが追加・削除されたときの処理
+    def handleDirectoryChanged(self, dirPath: str):
+        if not os.path.isdir(dirPath):
+            self.dirDepths.pop(dirPath, None)
+            self.pollDirMtimes.pop(dirPath, None)
+            self.removeMissingClips(dirPath, set())
+            return
+
+        files, dirs = autoload.listDirectory(dirPath)
+        self.removeMissingClips(dirPath, {entry[0] for entry in files})
+
+        # 新しいファイルは書き込みが終わるまで待つ
+        for path, ctime in files:
+            if path not in self.knownFiles and path not in self.pendingClips:
+                self.pendingClips[path] = [-1, 0]
+        if self.pendingClips:
+            self.settleTimer.start()
+
+        depth = self.dirDepths.get(dirPath, 0)
+        if depth < self.maxDepth:
+            for subDirPath in dirs:
+                if subDirPath not in self.dirDepths:
+                    self.addDirectory(subDirPath, depth + 1)
+                    self.handleDirectoryChanged(subDirPath)
+
+    def removeMissingClips(self, dirPath: str, existingFiles: set):
+        removed = {
+            entry[0]
+            for entry in self.clips
+            if os.path.dirname(entry[0]) == dirPath and entry[0] not in existingFiles
+        }
+        if removed:
+            self.clips = [entry for entry in self.clips if entry[0] not in removed]
+            self.knownFiles -= removed
+
+    # ファイルサイズが一定時間変化しなければ書き込み完了とみなす
+    def checkPendingClips(self):
+        for path, state in list(self.pendingClips.items()):
+            try:
+                size = os.path.getsize(path)
+                ctime = os.path.getctime(path)
+            except OSError:
+                del self.pendingClips[path]
+                continue
+
+            if size > 0 and size == state[0]:
+                state[1] += 1
+            else:
+                state[0] = size
+                state[1] = 0
+
+            if state[1] >= CLIP_SETTLE_COUNT:
+                del self.pendingClips[path]
+                self.insertClip(path, ctime)
+                self.clipAdded.emit(path)
+
+        if not self.pendingClips:
+            self.settleTimer.stop()
+
+    def insertClip(self, path: str, ctime: float):
+        index = 0
+        while index < len(self.clips) and self.clips[index][1] > ctime:
+            index += 1
+        self.clips.insert(index, [path, ctime])
+        self.knownFiles.add(path)
+
+    def pollDirectories(self):
+        for dirPath, mtime in list(self.pollDirMtimes.items()):
+            try:
+                newMtime = os.stat(dirPath).st_mtime
+            except OSError:
+                newMtime = None
+            if newMtime != mtime:
+                self.pollDirMtimes[dirPath] = newMtime
+                self.handleDirectoryChanged(dirPath)
+
+        if not self.pollDirMtimes:
+            self.pollTimer.stop()
+
+
 class CustomMediaPlayer(QMediaPlayer):
     def __init__(
         self,
@@ -556,6 +987,26 @@ class CustomMediaPlayer(QMediaPlayer):
 
         self.trimStartPositon = 0
         self.trimEndPositon = 0
+        # 連結して出力するために追加したトリミング範囲 (開始位置, 終了位置) の一覧
+        self.trimRanges = []
+        # 切り抜いて出力する範囲 {"x", "y", "width", "height"}（元動画のピクセル）
+        self.crop = None
+
+        # キーフレームの時刻（秒）の一覧と、トリミング位置をキーフレームに合わせるか
+        self.keyframes = []
+        self.snapToKeyframe = False
+
+        # 音量から見つけたハイライト候補と、最後に適用した候補の番号
+        self.highlights = []
+        self.highlightIndex = -1
+
+        # 再生にプロキシを使用している場合も、出力や解析には元の動画を使用する
+        self.sourcePath = ""
+        self.useProxy = False
+        self.proxyWorker = None
+        # プロキシへの切り替え中か、切り替え後に復元する (再生位置, 再生中か)
+        self.isSwitchingSource = False
+        self.pendingSwitch = None
 
         # オーディオ出力を設定
         self.audioOutput = QAudioOutput()
@@ -566,14 +1017,51 @@ class CustomMediaPlayer(QMediaPlayer):
         self.durationChanged.connect(self.seekbar.handleDurationChange)
         self.positionChanged.connect(self.seekbar.handlePositionChange)
         self.positionChanged.connect(self.repeatPlaybackIfInRange)
+        self.mediaStatusChanged.connect(self.handleMediaStatusChanged)
 
     def startPlay(self, url: QUrl):
         self.stop()
         QCoreApplication.processEvents()
+        self.sourcePath = url.toLocalFile()
+        self.isSwitchingSource = False
+        self.pendingSwitch = None
         self.setSource(url)
         self.togglePlayback()
         self.playBtn.setEnabled(True)
         self.saveBtn.setEnabled(True)
+        self.startProxy()
+
+    # 必要な場合はバックグラウンドでプロキシを作成する
+    def startProxy(self):
+        if self.proxyWorker is not None:
+            self.proxyWorker.cancel()
+            self.proxyWorker = None
+        if not self.useProxy:
+            return
+        self.proxyWorker = ProxyWorker(self.sourcePath, self)
+        self.proxyWorker.proxyReady.connect(self.handleProxyReady)
+        self.proxyWorker.finished.connect(self.proxyWorker.deleteLater)
+        self.proxyWorker.start()
+
+    # プロキシの作成が終わったら、再生位置を保ったまま切り替える
+    def handleProxyReady(self, path: str, proxyPath: str):
+        if path != self.sourcePath:
+            return
+        self.isSwitchingSource = True
+        self.pendingSwitch = (self.position(), self.isPlaying())
+        self.pause()
+        self.setSource(QUrl.fromLocalFile(proxyPath))
+
+    def handleMediaStatusChanged(self, status):
+        if (
+            self.pendingSwitch is not None
+            and status == QMediaPlayer.MediaStatus.LoadedMedia
+        ):
+            position, isPlaying = self.pendingSwitch
+            self.pendingSwitch = None
+            self.setPosition(position)
+            if isPlaying:
+                self.play()
 
     # 再生と一時停止を切り替える
     def togglePlayback(self):
@@ -647,10 +1135,53 @@ class CustomMediaPlayer(QMediaPlayer):
 
         return func
 
+    # ハイライト候補を順番にトリミング範囲に設定し、その位置に移動する
+    def applyNextHighlight(self):
+        if not self.highlights:
+            return None
+        self.highlightIndex = (self.highlightIndex + 1) % len(self.highlights)
+        candidate = self.highlights[self.highlightIndex]
+        self.trimStartPositon = candidate["start"]
+        self.trimEndPositon = candidate["end"]
+        self.setPosition(candidate["start"])
+        self.seekbar.update()
+        return candidate
+
+    # 現在のトリミング範囲を連結して出力する範囲に追加する（重なる範囲は結合する）
+    def addTrimRange(self):
+        if self.trimEndPositon <= self.trimStartPositon:
+            return False
+        ranges = sorted(
+            self.trimRanges + [(self.trimStartPositon, self.trimEndPositon)]
+        )
+        merged = [ranges[0]]
+        for start, end in ranges[1:]:
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        self.trimRanges = merged
+        self.seekbar.update()
+        return True
+
+    def clearTrimRanges(self):
+        self.trimRanges = []
+        self.seekbar.update()
+
+    # トリミング位置として使う現在の再生位置
+    def getTrimPosition(self):
+        if self.snapToKeyframe:
+            return min(
+                keyframeindex.snapToKeyframe(self.keyframes, self.position()),
+                self.duration(),
+            )
+        return self.position()
+
     # トリミング開始位置を設定
     def setStartTrimPosition(self):
-        if self.position() < self.trimEndPositon:
-            self.trimStartPositon = self.position()
+        position = self.getTrimPosition()
+        if position < self.trimEndPositon:
+            self.trimStartPositon = position
             self.seekbar.update()
         else:
             self.pause()
@@ -679,13 +1210,14 @@ class CustomMediaPlayer(QMediaPlayer):
 
     def setStartTrimPositionAtStart(self):
         self.trimStartPositon = 0
-        self.trimEndPositon = self.position()
+        self.trimEndPositon = self.getTrimPosition()
         self.seekbar.update()
 
     # トリミング終了位置を設定
     def setTrimEndPos(self):
-        if self.position() > self.trimStartPositon:
-            self.trimEndPositon = self.position()
+        position = self.getTrimPosition()
+        if position > self.trimStartPositon:
+            self.trimEndPositon = position
             self.seekbar.update()
         else:
             self.pause()
@@ -714,17 +1246,28 @@ class CustomMediaPlayer(QMediaPlayer):
 
     def setTrimEndPosAtEnd(self):
         self.trimEndPositon = self.duration()
-        self.trimStartPositon = self.position()
+        self.trimStartPositon = self.getTrimPosition()
         self.seekbar.update()
 
 
 class CustomVideoWidget(QVideoWidget):
+    cropChanged = pyqtSignal()
+
     def __init__(self, mediaPlayer: CustomMediaPlayer):
         super().__init__()
         self.setAcceptDrops(True)
         self.windowChild.installEventFilter(self)
         self.mediaPlayer = mediaPlayer
 
+        # 切り抜く範囲をドラッグで指定するか、ドラッグの開始位置と元動画の (幅, 高さ)
+        self.isCropMode = False
+        self.dragOrigin = None
+        self.sourceSize = None
+        # 動画はネイティブのウィンドウに描画されるため、範囲はトップレベルの枠で表示する
+        self.cropBand = QRubberBand(QRubberBand.Shape.Rectangle)
+        self.cropBand.setAttribute(Qt.WidgetAttribute.WA_QuitOnClose, False)
+        self.mediaPlayer.durationChanged.connect(self.updateCropBand)
+
     @property
     def windowChild(self):
         child = self.findChild(QWidget)
@@ -740,9 +1283,102 @@ class CustomVideoWidget(QVideoWidget):
                 if event.mimeData().hasUrls():
                     url = event.mimeData().urls()[0]
                     self.mediaPlayer.startPlay(url)
+            elif event.type() == QEvent.Type.MouseButtonPress:
+                if self.isCropMode and event.button() == Qt.MouseButton.LeftButton:
+                    self.startCropDrag(obj.mapTo(self, event.position()))
+            elif event.type() == QEvent.Type.MouseMove:
+                if self.dragOrigin is not None:
+                    self.updateCropDrag(obj.mapTo(self, event.position()))
+            elif event.type() == QEvent.Type.MouseButtonRelease:
+                if self.dragOrigin is not None:
+                    self.finishCropDrag(obj.mapTo(self, event.position()))
 
         return super().eventFilter(obj, event)
 
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.updateCropBand()
+
+    # ウィジェット内で動画が表示されている範囲（縦横比を保って中央に表示される）
+    def getVideoRect(self):
+        sourceWidth, sourceHeight = self.sourceSize
+        scale = min(self.width() / sourceWidth, self.height() / sourceHeight)
+        return QRectF(
+            (self.width() - sourceWidth * scale) / 2,
+            (self.height() - sourceHeight * scale) / 2,
+            sourceWidth * scale,
+            sourceHeight * scale,
+        )
+
+    def clampToVideo(self, pos: QPointF):
+        videoRect = self.getVideoRect()
+        return QPointF(
+            min(max(pos.x(), videoRect.left()), videoRect.right()),
+            min(max(pos.y(), videoRect.top()), videoRect.bottom()),
+        )
+
+    def showCropBand(self, rect: QRectF):
+        self.cropBand.setGeometry(
+            QRect(self.mapToGlobal(rect.topLeft().toPoint()), rect.size().toSize())
+        )
+        self.cropBand.show()
+
+    # 切り抜く範囲は出力に使う元動画の解像度で扱う（プロキシで再生している場合も同じ）
+    def startCropDrag(self, pos: QPointF):
+        info = probe.probeVideo(self.mediaPlayer.sourcePath)
+        if info is None:
+            return
+        self.sourceSize = (info["width"], info["height"])
+        self.dragOrigin = self.clampToVideo(pos)
+        self.updateCropDrag(pos)
+
+    def updateCropDrag(self, pos: QPointF):
+        self.showCropBand(QRectF(self.dragOrigin, self.clampToVideo(pos)).normalized())
+
+    # ドラッグした範囲を元動画のピクセルに変換する（YUV 4:2:0で扱えるよう偶数に揃える）
+    def finishCropDrag(self, pos: QPointF):
+        rect = QRectF(self.dragOrigin, self.clampToVideo(pos)).normalized()
+        self.dragOrigin = None
+        videoRect = self.getVideoRect()
+        scale = self.sourceSize[0] / videoRect.width()
+
+        def toSource(value: float):
+            return int(value * scale) // 2 * 2
+
+        crop = {
+            "x": toSource(rect.x() - videoRect.x()),
+            "y": toSource(rect.y() - videoRect.y()),
+            "width": toSource(rect.width()),
+            "height": toSource(rect.height()),
+        }
+        if crop["width"] < MIN_CROP_SIZE or crop["height"] < MIN_CROP_SIZE:
+            crop = None
+        self.mediaPlayer.crop = crop
+        self.updateCropBand()
+        self.cropChanged.emit()
+
+    # 指定済みの範囲の枠を、ウィンドウの移動やサイズ変更に合わせて表示し直す
+    def updateCropBand(self):
+        crop = self.mediaPlayer.crop
+        if (
+            crop is None
+            or self.sourceSize is None
+            or not self.isVisible()
+            or self.window().isMinimized()
+        ):
+            self.cropBand.hide()
+            return
+        videoRect = self.getVideoRect()
+        scale = videoRect.width() / self.sourceSize[0]
+        self.showCropBand(
+            QRectF(
+                videoRect.x() + crop["x"] * scale,
+                videoRect.y() + crop["y"] * scale,
+                crop["width"] * scale,
+                crop["height"] * scale,
+            )
+        )
+
 
 class SeekBar(QWidget):
     def __init__(self, mediaPlayer: CustomMediaPlayer):
@@ -750,12 +1386,33 @@ class SeekBar(QWidget):
 
         self.duration = 0
         self.position = 0
+        self.pendingPosition = 0
+        self.labelSeconds = None
         self.mediaPlayer = mediaPlayer
-        self.setFixedHeight(30)
+        self.renderer = seekbarrenderer.SeekBarRenderer()
+        self.setFixedHeight(SEEKBAR_HEIGHT)
         self.setMouseTracking(True)
         self.nowTrimStartPositon = 0
         self.nowTrimEndPositon = 0
 
+        # 再生位置の更新は画面のリフレッシュレートに合わせてまとめる
+        self.positionTimer = QTimer(self)
+        self.positionTimer.setSingleShot(True)
+        self.positionTimer.timeout.connect(self.handlePositionTimeout)
+
+        # サムネイルは別スレッドで作成し、シグナルでUIスレッドに渡す
+        self.hoverTimeMs = None
+        self.hoverGlobalPos = QPoint()
+        self.thumbnailNotifier = ThumbnailNotifier()
+        self.thumbnailNotifier.frameReady.connect(self.handleThumbnailReady)
+        self.thumbnailExtractor = thumbnail.ThumbnailExtractor(
+            self.thumbnailNotifier.frameReady.emit
+        )
+
+        # 波形とキーフレームは動画ごとに一度だけ解析する
+        self.waveformWorker = None
+        self.keyframeWorker = None
+
         self.layout = QHBoxLayout()
         self.layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(self.layout)
@@ -763,30 +1420,137 @@ class SeekBar(QWidget):
         self.positionLabel = QLabel("0:00:00")
         self.positionLabel.setFixedWidth(60)
         self.positionLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.positionLabel.setStyleSheet(SEEKBAR_LABEL_STYLE)
         self.layout.addWidget(self.positionLabel)
 
         self.remainSecondsLabel = QLabel("0:00:00")
         self.remainSecondsLabel.setFixedWidth(60)
         self.remainSecondsLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.remainSecondsLabel.setStyleSheet(SEEKBAR_LABEL_STYLE)
         self.layout.addStretch()
         self.layout.addWidget(self.remainSecondsLabel)
 
     # 動画の長さが変更されたときの処理
     def handleDurationChange(self, duration):
+        # プロキシへの切り替え時はトリミング範囲と解析結果を保持する
+        if self.mediaPlayer.isSwitchingSource:
+            if duration > 0:
+                self.mediaPlayer.isSwitchingSource = False
+                self.duration = duration
+                self.renderer.duration = duration
+                self.mediaPlayer.trimEndPositon = min(
+                    self.mediaPlayer.trimEndPositon, duration
+                )
+                self.update()
+            return
+
         self.duration = duration
         self.mediaPlayer.trimStartPositon = 0
         self.mediaPlayer.trimEndPositon = duration
+        self.mediaPlayer.trimRanges = []
+        self.mediaPlayer.crop = None
+
+        self.renderer.setDuration(duration)
+        self.mediaPlayer.keyframes = []
+        self.mediaPlayer.highlights = []
+        self.mediaPlayer.highlightIndex = -1
+        if self.waveformWorker is not None:
+            self.waveformWorker.cancel()
+            self.waveformWorker = None
+        if duration > 0:
+            path = self.mediaPlayer.sourcePath
+            self.thumbnailExtractor.setSource(
+                path, duration, seekbarrenderer.FILMSTRIP_COUNT
+            )
+            # 解析中に動画が切り替わっても終了まで保持されるよう親を設定する
+            self.waveformWorker = WaveformWorker(path, self)
+            self.waveformWorker.waveformReady.connect(self.handleWaveformReady)
+            self.waveformWorker.finished.connect(self.waveformWorker.deleteLater)
+            self.waveformWorker.start()
+            self.keyframeWorker = KeyframeWorker(path, self)
+            self.keyframeWorker.keyframesReady.connect(self.handleKeyframesReady)
+            self.keyframeWorker.finished.connect(self.keyframeWorker.deleteLater)
+            self.keyframeWorker.start()
+
+    # 波形の解析が終わったときの処理
+    def handleWaveformReady(self, path: str, blocks):
+        if path != self.mediaPlayer.sourcePath:
+            return
+        self.renderer.setWaveform(blocks)
+        self.mediaPlayer.highlights = highlight.findHighlights(blocks, self.duration)
+        self.mediaPlayer.highlightIndex = -1
+        self.update()
+
+    # キーフレームの取得が終わったときの処理
+    def handleKeyframesReady(self, path: str, keyframes: list):
+        if path != self.mediaPlayer.sourcePath:
+            return
+        self.mediaPlayer.keyframes = keyframes
+        self.renderer.setKeyframes(keyframes)
+        self.update()
+
+    # サムネイルが作成されたときの処理
+    def handleThumbnailReady(self, kind: str, key: int, imagePath: str):
+        if kind == thumbnail.KIND_FILMSTRIP:
+            self.renderer.setFilmstripFrame(key, QPixmap(imagePath))
+            self.update()
+        elif kind == thumbnail.KIND_HOVER and self.hoverTimeMs is not None:
+            # マウスが別の位置に移動している場合は表示しない
+            if (
+                self.hoverTimeMs // thumbnail.HOVER_STEP_MS * thumbnail.HOVER_STEP_MS
+                != key
+            ):
+                return
+            QToolTip.showText(
+                self.hoverGlobalPos,
+                '<img src="{}"><br>{}'.format(
+                    imagePath,
+                    time.strftime("%H:%M:%S", time.gmtime(self.hoverTimeMs / 1000)),
+                ),
+                self,
+            )
 
     # 再生位置が変更されたときの処理
+    # 前回の反映から1フレーム以内の変更は、タイマーで最後の位置のみを反映する
     def handlePositionChange(self, position):
-        self.position = position
-        self.positionLabel.setText(
-            time.strftime("%H:%M:%S", time.gmtime(position / 1000))
-        )
-        self.remainSecondsLabel.setText(
-            time.strftime("%H:%M:%S", time.gmtime((self.duration - position) / 1000))
+        self.pendingPosition = position
+        if self.positionTimer.isActive():
+            return
+        self.applyPosition()
+        self.positionTimer.start(self.getFrameInterval())
+
+    def handlePositionTimeout(self):
+        if self.pendingPosition != self.position:
+            self.applyPosition()
+
+    def getFrameInterval(self):
+        screen = self.screen()
+        refreshRate = screen.refreshRate() if screen is not None else 0
+        if refreshRate <= 0:
+            refreshRate = DEFAULT_REFRESH_RATE
+        return max(1, int(1000 / refreshRate))
+
+    # 再生位置を反映し、変更前後の線の周辺のみを再描画する
+    def applyPosition(self):
+        oldPosition = self.position
+        self.position = self.pendingPosition
+
+        # 時間表示は秒が変わったときのみ更新する
+        labelSeconds = (
+            int(self.position / 1000),
+            int((self.duration - self.position) / 1000),
         )
-        self.update()
+        if labelSeconds != self.labelSeconds:
+            self.labelSeconds = labelSeconds
+            self.positionLabel.setText(
+                time.strftime("%H:%M:%S", time.gmtime(labelSeconds[0]))
+            )
+            self.remainSecondsLabel.setText(
+                time.strftime("%H:%M:%S", time.gmtime(labelSeconds[1]))
+            )
+
+        self.update(self.renderer.playheadRect(oldPosition))
+        self.update(self.renderer.playheadRect(self.position))
 
     # 描画処理
     def paintEvent(self, event):
@@ -797,41 +1561,36 @@ class SeekBar(QWidget):
         if p.isActive() == False:
             p.begin(self)
 
-        self.paint(p)
+        self.paint(p, event.rect())
         p.end()
 
     # シークバーを描画
-    def paint(self, p: QPainter):
-        center = int(self.width() * self.position / self.duration)
-        trimStart = int(
-            self.width() * self.mediaPlayer.trimStartPositon / self.duration
+    def paint(self, p: QPainter, rect=None):
+        self.renderer.setSize(self.width(), self.height(), self.devicePixelRatioF())
+        self.renderer.setTrim(
+            self.mediaPlayer.trimStartPositon, self.mediaPlayer.trimEndPositon
         )
-        trimEnd = int(self.width() * self.mediaPlayer.trimEndPositon / self.duration)
-
-        p.setPen(Qt.GlobalColor.red)
-        p.setBrush(Qt.GlobalColor.red)
-        p.drawRect(center - 1, 0, 1, self.height())
-
-        pen = QPen()
-        pen.setColor(Qt.GlobalColor.black)
-        pen.setWidth(2)
-        p.setPen(pen)
-
-        p.setBrush(Qt.BrushStyle.SolidPattern)
-        p.setBrush(QColor(81, 93, 232, 100))
-        rectangle = QRectF(trimStart, 0, trimEnd - trimStart, self.height())
-        p.drawRoundedRect(rectangle, 5, 5)
-
-        p.setBrush(Qt.BrushStyle.NoBrush)
-        rectangle = QRectF(0, 0, self.width(), self.height())
-        p.drawRoundedRect(rectangle, 5, 5)
+        self.renderer.setRanges(self.mediaPlayer.trimRanges)
+        self.renderer.paint(p, self.position, rect)
 
     # マウスが動いたときの処理
     def mouseMoveEvent(self, a0: QMouseEvent) -> None:
         if a0.buttons() == Qt.MouseButton.LeftButton and self.duration != 0:
             self.seek(a0.pos().x())
+        elif a0.buttons() == Qt.MouseButton.NoButton and self.duration != 0:
+            # カーソル位置のフレームをプレビュー表示する
+            x = min(max(a0.pos().x(), 0), self.width())
+            self.hoverTimeMs = int(x / self.width() * self.duration)
+            self.hoverGlobalPos = a0.globalPosition().toPoint()
+            self.thumbnailExtractor.requestHover(self.hoverTimeMs)
         return super().mouseMoveEvent(a0)
 
+    # マウスがシークバーから離れたときの処理
+    def leaveEvent(self, a0: QEvent) -> None:
+        self.hoverTimeMs = None
+        QToolTip.hideText()
+        return super().leaveEvent(a0)
+
     # マウスがクリックされたときの処理
     def mousePressEvent(self, a0: QMouseEvent) -> None:
         if self.duration != 0 and a0.button() == Qt.MouseButton.LeftButton:
@@ -953,7 +1712,52 @@ class OutputSetting(QGridLayout):
             self.settings.settings["defaultOptions"]["noAudio"]
         )
 
+        self.twoPassCheckBox = QCheckBox("2パスエンコード")
+        self.twoPassCheckBox.setToolTip(
+            "2回に分けてエンコードし、指定した容量に近づけます。出力時間は長くなります。"
+        )
+        self.twoPassCheckBox.setChecked(
+            self.settings.settings["defaultOptions"]["twoPass"]
+        )
+
+        self.allowCopyCheckBox = QCheckBox("可能な場合は無劣化コピー")
+        self.allowCopyCheckBox.setToolTip(
+            "元動画の解像度とフレームレートが出力設定と同じで容量内に収まる場合、再エンコードせずに高速に出力します。"
+        )
+        self.allowCopyCheckBox.setChecked(
+            self.settings.settings["defaultOptions"]["allowCopy"]
+        )
+
+        self.parallelEncodeCheckBox = QCheckBox("分割して並列エンコード")
+        self.parallelEncodeCheckBox.setToolTip(
+            "長い範囲をキーフレームで分割し、複数のCPUコアで同時にエンコードします。ソフトウェアエンコーダーの場合のみ有効です。"
+        )
+        self.parallelEncodeCheckBox.setChecked(
+            self.settings.settings["defaultOptions"]["parallelEncode"]
+        )
+
+        self.reuseSegmentsCheckBox = QCheckBox("エンコード済みの区間を再利用")
+        self.reuseSegmentsCheckBox.setToolTip(
+            "出力した映像を区間ごとに保存しておき、トリミング位置を少し変えて出力し直す場合に変更された区間のみをエンコードします。"
+        )
+        self.reuseSegmentsCheckBox.setChecked(
+            self.settings.settings["defaultOptions"]["reuseSegments"]
+        )
+
+        self.decimateCheckBox = QCheckBox("静止した場面を間引く")
+        self.decimateCheckBox.setToolTip(
+            "ロード画面やメニューなど、ほぼ同じフレームが続く場面のフレームを取り除き、可変フレームレートで出力します。動きのある場面に容量を多く使えるようになり、出力も速くなります。"
+        )
+        self.decimateCheckBox.setChecked(
+            self.settings.settings["defaultOptions"]["decimate"]
+        )
+
         otherLayout.addWidget(self.noAudioCheckBox)
+        otherLayout.addWidget(self.twoPassCheckBox)
+        otherLayout.addWidget(self.allowCopyCheckBox)
+        otherLayout.addWidget(self.parallelEncodeCheckBox)
+        otherLayout.addWidget(self.reuseSegmentsCheckBox)
+        otherLayout.addWidget(self.decimateCheckBox)
         otherLayout.addStretch()
         otherBox.setLayout(otherLayout)
 
@@ -996,6 +1800,11 @@ class OutputSetting(QGridLayout):
         output["resolution"] = self.resolutionRadioGroup.checkedButton().text()
         output["frameRate"] = int(self.frameRateRadioGroup.checkedButton().text())
         output["noAudio"] = self.noAudioCheckBox.isChecked()
+        output["twoPass"] = self.twoPassCheckBox.isChecked()
+        output["allowCopy"] = self.allowCopyCheckBox.isChecked()
+        output["parallelEncode"] = self.parallelEncodeCheckBox.isChecked()
+        output["reuseSegments"] = self.reuseSegmentsCheckBox.isChecked()
+        output["decimate"] = self.decimateCheckBox.isChecked()
 
         if self.sizeRadioGroup.checkedButton().text() == "カスタム":
             output["size"] = self.sizeSpinBox.value()
@@ -1004,6 +1813,15 @@ class OutputSetting(QGridLayout):
 
         return output
 
+    # 解像度とフレームレートのラジオボタンを選択する
+    def selectVideoSetting(self, resolution: str, frameRate: int):
+        for button in self.resolutionRadioGroup.buttons():
+            if button.text() == resolution:
+                button.setChecked(True)
+        for button in self.frameRateRadioGroup.buttons():
+            if button.text() == str(frameRate):
+                button.setChecked(True)
+
 
 class ExportWindow(QDialog):
     def __init__(
@@ -1012,6 +1830,9 @@ class ExportWindow(QDialog):
         inputPath: str,
         trimStartPositon: int,
         trimEndPositon: int,
+        exportQueue: exportqueue.ExportQueue,
+        ranges: list = None,
+        crop: dict = None,
     ):
         super().__init__()
 
@@ -1019,6 +1840,16 @@ class ExportWindow(QDialog):
         self.inputPath = inputPath
         self.trimStartPositon = trimStartPositon
         self.trimEndPositon = trimEndPositon
+        # 連結して出力する範囲の一覧（1つの範囲のみを出力する場合はNone）
+        self.ranges = ranges
+        # 切り抜く範囲（切り抜かない場合はNone）
+        self.crop = crop
+        self.exportQueue = exportQueue
+        self.isExporting = False
+        self.predictWorker = None
+        self.suggestion = None
+        # 同じデコードから同時に出力する追加の出力設定
+        self.extraTargets = []
 
         self.setMinimumWidth(300)
 
@@ -1040,6 +1871,12 @@ class ExportWindow(QDialog):
         self.cancelButton = QPushButton("キャンセル")
         self.cancelButton.clicked.connect(self.close)
 
+        self.queueButton = QPushButton("キューに追加")
+        self.queueButton.setToolTip(
+            "バックグラウンドで出力します。出力中も編集を続けることができます。"
+        )
+        self.queueButton.clicked.connect(self.addToQueue)
+
         outputFileNameLabel = QLabel("ファイル名")
         outputFileNameLabel.setMinimumWidth(60)
         outputFileNameLabel.setToolTip(
@@ -1055,85 +1892,381 @@ class ExportWindow(QDialog):
         fileNameLayout.addWidget(outputFileNameLabel, 1, 0)
         fileNameLayout.addWidget(self.outputFileNameEdit, 1, 1)
 
+        # 出力前に容量と出力時間を予測する
+        self.predictButton = QPushButton("容量と時間を予測")
+        self.predictButton.setToolTip(
+            "出力範囲の数か所を短くエンコードして、出力後の容量と出力時間を予測します。"
+        )
+        self.predictButton.clicked.connect(self.startPrediction)
+        self.suggestionButton = QPushButton("おすすめの設定にする")
+        self.suggestionButton.setVisible(False)
+        self.suggestionButton.clicked.connect(self.applySuggestion)
+        self.predictionLabel = QLabel()
+        self.predictionLabel.setWordWrap(True)
+
+        predictionLayout = QGridLayout()
+        predictionLayout.addWidget(self.predictButton, 0, 0)
+        predictionLayout.addWidget(self.suggestionButton, 0, 1)
+        predictionLayout.addWidget(self.predictionLabel, 1, 0, 1, 2)
+
+        # 複数の容量・解像度・フレームレートで同時に出力する
+        targetBox = QGroupBox("同時に出力")
+        targetBox.setToolTip(
+            "追加した設定でも同時に出力します。動画の読み込みは1回で済むため、別々に出力するより速くなります。"
+        )
+        self.targetList = QListWidget()
+        self.targetList.setMaximumHeight(80)
+        addTargetButton = QPushButton("現在の設定を追加")
+        addTargetButton.clicked.connect(self.addTarget)
+        removeTargetButton = QPushButton("削除")
+        removeTargetButton.clicked.connect(self.removeTarget)
+
+        targetLayout = QGridLayout()
+        targetLayout.addWidget(self.targetList, 0, 0, 1, 2)
+        targetLayout.addWidget(addTargetButton, 1, 0)
+        targetLayout.addWidget(removeTargetButton, 1, 1)
+        targetBox.setLayout(targetLayout)
+        # 範囲を連結する場合は1つの設定のみで出力する
+        if self.ranges:
+            targetBox.setEnabled(False)
+
         # レイアウトをセット
         confirmLayout = QHBoxLayout()
         confirmLayout.addWidget(self.cancelButton)
+        confirmLayout.addWidget(self.queueButton)
         confirmLayout.addWidget(self.saveButton)
         self.layout.addLayout(self.outputSettingLayout)
+        if self.ranges:
+            totalMs = sum(end - start for start, end in self.ranges)
+            self.layout.addWidget(
+                QLabel(
+                    "{}個の範囲を連結して出力します（合計 {}）".format(
+                        len(self.ranges),
+                        time.strftime("%H:%M:%S", time.gmtime(totalMs / 1000)),
+                    )
+                )
+            )
+        if self.crop:
+            self.layout.addWidget(
+                QLabel(
+                    "{}x{}の範囲を切り抜いて出力します"
+                    "（縦横比を保って解像度内に縮小します）".format(
+                        self.crop["width"], self.crop["height"]
+                    )
+                )
+            )
         self.layout.addLayout(fileNameLayout)
+        self.layout.addLayout(predictionLayout)
+        self.layout.addWidget(targetBox)
         self.layout.addLayout(confirmLayout)
 
-    def startExportProcess(self):
+    # 現在の容量・解像度・フレームレートを同時に出力する設定に追加する
+    def addTarget(self):
+        output = self.outputSettingLayout.getOutputSetting()
+        target = {
+            "resolution": output["resolution"],
+            "frameRate": output["frameRate"],
+            "size": output["size"],
+        }
+        if target in self.extraTargets:
+            return
+        self.extraTargets.append(target)
+        self.targetList.addItem(getTargetText(target))
+
+    def removeTarget(self):
+        row = self.targetList.currentRow()
+        if row < 0:
+            return
+        self.targetList.takeItem(row)
+        self.extraTargets.pop(row)
+
+    # 現在の設定と追加した設定の出力先のリストを返す（同時に出力しない場合は1つ）
+    def getTargets(self, output: dict):
+        current = {
+            "resolution": output["resolution"],
+            "frameRate": output["frameRate"],
+            "size": output["size"],
+        }
+        targets = [current] + [t for t in self.extraTargets if t != current]
+
+        folderPath = self.outputSettingLayout.outputPathEdit.text()
+        fileName = self.outputFileNameEdit.text()
+        for target in targets:
+            # 複数の場合はファイル名に容量・解像度・フレームレートを付ける
+            if len(targets) > 1:
+                name = "{}_{}MB_{}p{}".format(
+                    fileName,
+                    target["size"],
+                    target["resolution"].split("x")[1],
+                    target["frameRate"],
+                )
+            else:
+                name = fileName
+            target["outputPath"] = "{}/{}.mp4".format(folderPath, name)
+        return targets
+
+    # expoter.exportVideoの引数のリストを出力先ごとに作成する（出力フォルダが無い場合はNone）
+    def getExportArgsList(self):
         output = self.outputSettingLayout.getOutputSetting()
 
         if os.path.exists(self.outputSettingLayout.outputPathEdit.text()) is False:
             QMessageBox.warning(self, "保存失敗", "出力フォルダが存在しません。")
-            return
+            return None
 
-        fileName = self.outputFileNameEdit.text()
-        outputPath = "{}/{}.mp4".format(
-            self.outputSettingLayout.outputPathEdit.text(), fileName
+        # 最低ビットレートでも容量に収まらない設定では出力しない
+        duration = expoter.getExportDuration(
+            self.trimStartPositon, self.trimEndPositon, self.ranges
         )
+        for target in self.getTargets(output):
+            plan = expoter.planExport(
+                target["size"],
+                duration,
+                expoter.getCroppedResolution(target["resolution"], self.crop),
+                target["frameRate"],
+                output["noAudio"],
+            )
+            if not plan["fits"]:
+                QMessageBox.warning(
+                    self,
+                    "保存失敗",
+                    "{}MBでは最低限の画質でも容量に収まりません（約{:.1f}MB必要です）。\n"
+                    "動画を短くするか、容量を大きくしてください。".format(
+                        target["size"], plan["estimatedBytes"] / 1024 / 1024
+                    ),
+                )
+                return None
+
+        return [
+            (
+                self.inputPath,
+                target["outputPath"],
+                self.trimStartPositon,
+                self.trimEndPositon,
+                target["resolution"],
+                target["frameRate"],
+                target["size"],
+                output["noAudio"],
+                output["twoPass"],
+                output["allowCopy"],
+                output["parallelEncode"],
+                output["reuseSegments"],
+                self.ranges,
+                self.crop,
+                output["decimate"],
+            )
+            for target in self.getTargets(output)
+        ]
 
-        args = (
-            self.inputPath,
-            outputPath,
-            self.trimStartPositon,
-            self.trimEndPositon,
-            output["resolution"],
-            output["frameRate"],
-            output["size"],
-            output["noAudio"],
+    # 現在の出力設定で予測を開始する
+    def startPrediction(self):
+        self.cancelPrediction()
+        output = self.outputSettingLayout.getOutputSetting()
+        self.predictButton.setEnabled(False)
+        self.suggestionButton.setVisible(False)
+        self.predictionLabel.setText("予測中...")
+
+        self.predictWorker = PredictWorker(
+            (
+                self.inputPath,
+                self.trimStartPositon,
+                self.trimEndPositon,
+                output["resolution"],
+                output["frameRate"],
+                output["size"],
+                output["noAudio"],
+                output["twoPass"],
+                self.ranges,
+                self.crop,
+                output["decimate"],
+            ),
+            self,
         )
+        self.predictWorker.predictionFinished.connect(self.handlePredictionFinished)
+        self.predictWorker.finished.connect(self.predictWorker.deleteLater)
+        self.predictWorker.start()
+
+    # ウィンドウと共にスレッドが破棄されないよう、終了するまで待機する
+    def cancelPrediction(self):
+        if self.predictWorker is not None:
+            self.predictWorker.cancel()
+            self.predictWorker.wait()
+            self.predictWorker = None
+
+    def handlePredictionFinished(self, prediction):
+        if self.sender() is not self.predictWorker:
+            return
+        self.predictWorker = None
+        self.predictButton.setEnabled(True)
 
-        self.saveButton.setVisible(False)
-        self.cancelButton.setVisible(False)
+        if prediction is None:
+            self.predictionLabel.setText("予測に失敗しました。")
+            return
 
-        self.thread = threading.Thread(target=expoter.exportVideo, args=args)
-        self.thread.start()
+        lines = [
+            "予測容量: {:.1f}MB　予測出力時間: {:.0f}秒".format(
+                prediction["size"] / 1024 / 1024, prediction["encodeTime"]
+            )
+        ]
+        if not prediction["fits"]:
+            lines.append("指定した容量を超える可能性があります。")
+
+        self.suggestion = prediction["suggestion"]
+        if self.suggestion is not None:
+            lines.append(
+                "この容量では画質が低くなります。{}・{}fpsがおすすめです。".format(
+                    self.suggestion["resolution"], self.suggestion["frameRate"]
+                )
+            )
+            self.suggestionButton.setVisible(True)
+        self.predictionLabel.setText("\n".join(lines))
 
-        progress = QProgressBar()
-        progress.setValue(1)
-        progress.setRange(
-            0,
-            int(output["size"]) * 1024,
+    def applySuggestion(self):
+        if self.suggestion is None:
+            return
+        self.outputSettingLayout.selectVideoSetting(
+            self.suggestion["resolution"], self.suggestion["frameRate"]
         )
+        self.suggestionButton.setVisible(False)
+        self.predictionLabel.setText("")
+
+    # キューでは出力先ごとに別のジョブとして出力する
+    def addToQueue(self):
+        argsList = self.getExportArgsList()
+        if argsList is None:
+            return
+
+        self.cancelPrediction()
+        for args in argsList:
+            self.exportQueue.addJob(args)
+        self.close()
 
-        progress.setFormat("出力中...")
-        self.layout.addWidget(progress)
+    def startExportProcess(self):
+        argsList = self.getExportArgsList()
+        if argsList is None:
+            return
+
+        # 出力のCPUを奪わないよう予測は中断する
+        self.cancelPrediction()
+        self.predictButton.setEnabled(False)
+        self.suggestionButton.setVisible(False)
+
+        self.saveButton.setVisible(False)
+        self.queueButton.setVisible(False)
+        self.cancelButton.clicked.disconnect()
+        self.cancelButton.clicked.connect(self.cancelExport)
 
-        while self.thread.is_alive():
-            QApplication.processEvents()
-            processingSize = getFileSizeKB(outputPath)
-            if processingSize > int(output["size"]) * 1024 * 0.9:
-                processingSize = int(int(output["size"]) * 1024 * 0.9)
-            progress.setValue(processingSize)
+        self.targetSizeKB = int(argsList[0][6]) * 1024
 
-        progress.setValue(int(output["size"]) * 1024)
+        self.progress = QProgressBar()
+        self.progress.setRange(0, EXPORT_PROGRESS_MAX)
+        self.progress.setValue(0)
+        self.progress.setFormat("出力中...")
+        self.layout.addWidget(self.progress)
 
-        if getFileSizeKB(outputPath) != 0:
+        # 複数の出力先がある場合は1回のデコードでまとめて出力する
+        if len(argsList) == 1:
+            self.worker = ExportWorker(argsList[0])
+        else:
+            output = self.outputSettingLayout.getOutputSetting()
+            targets = [
+                {
+                    "outputPath": args[1],
+                    "resolution": args[4],
+                    "frameRate": args[5],
+                    "size": args[6],
+                }
+                for args in argsList
+            ]
+            self.worker = ExportWorker(
+                (
+                    self.inputPath,
+                    targets,
+                    self.trimStartPositon,
+                    self.trimEndPositon,
+                    output["noAudio"],
+                    output["twoPass"],
+                    self.crop,
+                    output["decimate"],
+                ),
+                expoter.exportMultiple,
+            )
+        self.worker.progressChanged.connect(self.handleExportProgress)
+        self.worker.exportFinished.connect(self.handleExportFinished)
+        self.isExporting = True
+        self.worker.start()
+
+    # 出力を中断する（ffmpegの終了と途中のファイルの削除は出力スレッドで行われる）
+    def cancelExport(self):
+        self.cancelButton.setEnabled(False)
+        self.cancelButton.setText("キャンセル中...")
+        self.worker.cancel()
+
+    # 出力中にウィンドウを閉じた場合は出力を中断し、完了後に閉じる
+    def closeEvent(self, event):
+        if self.isExporting:
+            event.ignore()
+            self.cancelExport()
+        else:
+            self.cancelPrediction()
+            super().closeEvent(event)
+
+    # エンコードの進捗を表示
+    def handleExportProgress(self, progress: dict):
+        self.progress.setValue(int(progress["ratio"] * EXPORT_PROGRESS_MAX))
+        self.progress.setFormat(
+            "出力中... %p%  {}  速度: {:.1f}x".format(
+                time.strftime("%H:%M:%S", time.gmtime(progress["time"])),
+                progress["speed"],
+            )
+        )
+
+    # 複数の出力の場合はresultが出力ごとの結果のリストになる
+    def handleExportFinished(self, result):
+        self.isExporting = False
+        self.progress.setValue(EXPORT_PROGRESS_MAX)
+
+        if isinstance(result, list):
+            self.exportMultipleDone(result)
+        elif result["status"] == expoter.STATUS_DONE:
             self.exportDone(
                 self.outputSettingLayout.outputPathEdit.text(),
-                int(output["size"]) * 1024,
-                getFileSizeKB(outputPath),
+                self.targetSizeKB,
+                int(result["outputSize"] / 1024),
+                result["method"],
+                result["elapsed"],
+                result["droppedFrames"],
             )
+        elif result["status"] == expoter.STATUS_CANCELLED:
+            self.exportCancelled()
         else:
-            self.exportFailed()
+            self.exportFailed(result["error"])
 
-    def exportDone(self, outputFolderPath: str, targetSizeKB: int, outputSizeKB: int):
+    def exportDone(
+        self,
+        outputFolderPath: str,
+        targetSizeKB: int,
+        outputSizeKB: int,
+        method: str,
+        elapsed: float,
+        droppedFrames: int = 0,
+    ):
         outputSizeMB = round(outputSizeKB / 1024, 2)
+        methodText = EXPORT_METHOD_TEXT[method]
+        # 静止した場面を間引いた場合は取り除いたフレーム数も表示する
+        if droppedFrames:
+            methodText += f"\n間引いたフレーム数: {droppedFrames}"
 
         if outputSizeKB > targetSizeKB:
             QMessageBox.warning(
                 self,
                 "保存成功（容量超過）",
-                f"保存に成功しましたが、指定した容量を超えています。\n容量: {outputSizeMB}MB\n動画の長さを短くするか、出力設定を変更してください。",
+                f"保存に成功しましたが、指定した容量を超えています。\n容量: {outputSizeMB}MB\n出力方式: {methodText}\n出力時間: {elapsed:.1f}秒\n動画の長さを短くするか、出力設定を変更してください。",
             )
         else:
             QMessageBox.information(
                 self,
                 "保存完了",
-                "保存が完了しました。\n容量: " + str(outputSizeMB) + "MB",
+                f"保存が完了しました。\n容量: {outputSizeMB}MB\n出力方式: {methodText}\n出力時間: {elapsed:.1f}秒",
             )
 
         if self.settings.settings["openFolderAfterExport"]:
@@ -1143,11 +2276,256 @@ class ExportWindow(QDialog):
 
         self.close()
 
-    def exportFailed(self):
-        QMessageBox.warning(self, "保存失敗", "保存に失敗しました。")
+    # 出力ごとの容量と結果を表示する
+    def exportMultipleDone(self, results: list):
+        statuses = [result["status"] for result in results]
+        if expoter.STATUS_CANCELLED in statuses:
+            self.exportCancelled()
+            return
+
+        lines = []
+        isOverSize = False
+        for result, target in zip(results, self.worker.args[1]):
+            name = os.path.basename(result["outputPath"])
+            if result["status"] != expoter.STATUS_DONE:
+                lines.append(f"{name}: 失敗")
+                if result["error"]:
+                    lines[-1] += f"（{result['error']}）"
+                continue
+            outputSizeMB = round(result["outputSize"] / 1024 / 1024, 2)
+            line = f"{name}: {outputSizeMB}MB / {target['size']}MB"
+            if result["droppedFrames"]:
+                line += f"（間引き {result['droppedFrames']}フレーム）"
+            if result["outputSize"] > target["size"] * 1024 * 1024:
+                line += "（容量超過）"
+                isOverSize = True
+            lines.append(line)
+        lines.append(f"出力時間: {results[0]['elapsed']:.1f}秒")
+
+        if expoter.STATUS_DONE not in statuses:
+            QMessageBox.warning(self, "保存失敗", "\n".join(lines))
+        elif expoter.STATUS_FAILED in statuses or isOverSize:
+            QMessageBox.warning(
+                self, "保存完了（一部失敗・容量超過）", "\n".join(lines)
+            )
+        else:
+            QMessageBox.information(self, "保存完了", "\n".join(lines))
+
+        if (
+            expoter.STATUS_DONE in statuses
+            and self.settings.settings["openFolderAfterExport"]
+        ):
+            outputFolderPath = self.outputSettingLayout.outputPathEdit.text()
+            subprocess.run(["explorer", outputFolderPath.replace("/", "\\")])
 
         self.close()
 
+    def exportFailed(self, error: str = None):
+        message = "保存に失敗しました。"
+        if error:
+            message += "\n" + error
+        QMessageBox.warning(self, "保存失敗", message)
+
+        self.close()
+
+    def exportCancelled(self):
+        QMessageBox.information(self, "保存中止", "保存をキャンセルしました。")
+
+        self.close()
+
+
+class ExportWorker(QThread):
+    progressChanged = pyqtSignal(dict)
+    # expoter.exportVideoの場合は辞書、expoter.exportMultipleの場合はリスト
+    exportFinished = pyqtSignal(object)
+
+    def __init__(self, args: tuple, exportFunc=expoter.exportVideo):
+        super().__init__()
+        self.args = args
+        self.exportFunc = exportFunc
+        self.cancelEvent = threading.Event()
+
+    def run(self):
+        result = self.exportFunc(
+            *self.args,
+            onProgress=self.progressChanged.emit,
+            cancelEvent=self.cancelEvent,
+        )
+        self.exportFinished.emit(result)
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+
+class PredictWorker(QThread):
+    predictionFinished = pyqtSignal(object)
+
+    # args はpredictor.predictExportの引数
+    def __init__(self, args: tuple, parent=None):
+        super().__init__(parent)
+        self.args = args
+        self.cancelEvent = threading.Event()
+
+    def run(self):
+        prediction = predictor.predictExport(*self.args, cancelEvent=self.cancelEvent)
+        if not self.cancelEvent.is_set():
+            self.predictionFinished.emit(prediction)
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+
+class WaveformWorker(QThread):
+    waveformReady = pyqtSignal(str, object)
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.cancelEvent = threading.Event()
+
+    def run(self):
+        blocks = waveform.loadWaveform(self.path, self.cancelEvent)
+        if blocks is not None:
+            self.waveformReady.emit(self.path, blocks)
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+
+class ProxyWorker(QThread):
+    proxyReady = pyqtSignal(str, str)
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.cancelEvent = threading.Event()
+
+    def run(self):
+        info = probe.probeVideo(self.path)
+        if not proxy.needsProxy(info):
+            return
+        proxyPath = proxy.createProxy(
+            self.path, info["duration"], cancelEvent=self.cancelEvent
+        )
+        if proxyPath is not None:
+            self.proxyReady.emit(self.path, proxyPath)
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+
+class KeyframeWorker(QThread):
+    keyframesReady = pyqtSignal(str, object)
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self):
+        self.keyframesReady.emit(self.path, keyframeindex.loadKeyframes(self.path))
+
+
+class ThumbnailNotifier(QObject):
+    frameReady = pyqtSignal(str, int, str)
+
+
+class ExportQueueNotifier(QObject):
+    jobChanged = pyqtSignal(object)
+
+
+class ExportQueueWindow(QDialog):
+    def __init__(
+        self, exportQueue: exportqueue.ExportQueue, notifier: ExportQueueNotifier
+    ):
+        super().__init__()
+
+        self.exportQueue = exportQueue
+
+        self.setWindowTitle("出力キュー")
+        self.setWindowIcon(QIcon("images/icon.png"))
+        self.setMinimumWidth(500)
+
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+
+        self.setUpUI()
+        self.refresh()
+
+        notifier.jobChanged.connect(self.refresh)
+
+    def setUpUI(self):
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["ファイル名", "状態", "進捗"])
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 250)
+
+        upButton = QPushButton("上へ")
+        upButton.clicked.connect(lambda: self.moveSelectedJob(-1))
+        downButton = QPushButton("下へ")
+        downButton.clicked.connect(lambda: self.moveSelectedJob(1))
+        cancelButton = QPushButton("キャンセル")
+        cancelButton.clicked.connect(self.cancelSelectedJob)
+        removeButton = QPushButton("削除")
+        removeButton.clicked.connect(self.removeSelectedJob)
+        clearButton = QPushButton("完了済みを消去")
+        clearButton.clicked.connect(self.exportQueue.clearFinishedJobs)
+
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addWidget(upButton)
+        buttonLayout.addWidget(downButton)
+        buttonLayout.addWidget(cancelButton)
+        buttonLayout.addWidget(removeButton)
+        buttonLayout.addStretch()
+        buttonLayout.addWidget(clearButton)
+
+        self.layout.addWidget(self.table)
+        self.layout.addLayout(buttonLayout)
+
+    # ジョブ一覧を再描画する
+    def refresh(self, job=None):
+        selectedJobId = self.selectedJobId()
+        jobs = list(self.exportQueue.jobs)
+
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            nameItem = QTableWidgetItem(job["name"])
+            nameItem.setData(Qt.ItemDataRole.UserRole, job["id"])
+            statusText = EXPORT_JOB_STATUS_TEXT[job["status"]]
+            progressText = "{}%".format(int(job["progress"] * 100))
+            if job["status"] == exportqueue.JOB_RUNNING:
+                progressText += "  速度: {:.1f}x".format(job["speed"])
+
+            self.table.setItem(row, 0, nameItem)
+            self.table.setItem(row, 1, QTableWidgetItem(statusText))
+            self.table.setItem(row, 2, QTableWidgetItem(progressText))
+
+            if job["id"] == selectedJobId:
+                self.table.selectRow(row)
+
+    def selectedJobId(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return self.table.item(rows[0].row(), 0).data(Qt.ItemDataRole.UserRole)
+
+    def moveSelectedJob(self, offset: int):
+        jobId = self.selectedJobId()
+        if jobId is not None:
+            self.exportQueue.moveJob(jobId, offset)
+
+    def cancelSelectedJob(self):
+        jobId = self.selectedJobId()
+        if jobId is not None:
+            self.exportQueue.cancelJob(jobId)
+
+    def removeSelectedJob(self):
+        jobId = self.selectedJobId()
+        if jobId is not None:
+            self.exportQueue.removeJob(jobId)
+
 
 class WelcomeWindow(QDialog):
     def __init__(self):
@@ -1193,12 +2571,11 @@ class WelcomeWindow(QDialog):
         self.layout.addWidget(closeButton)
 
 
-def getFileSizeKB(filePath):
-    try:
-        size = os.path.getsize(filePath)
-        return int(size / 1024)
-    except FileNotFoundError:
-        return 0
+# 同時に出力する設定の表示用の文字列
+def getTargetText(target: dict):
+    return "{}MB　{}　{}fps".format(
+        target["size"], target["resolution"], target["frameRate"]
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import budget
+import encoders
+import expoter
+import settings
+
+# 予測に使用するサンプルの数と長さ（秒）
+SAMPLE_COUNT = 4
+SAMPLE_SECONDS = 2
+
+# ffmpegの起動やシークなど、長さに比例しない1パスあたりの処理時間（秒）
+STARTUP_SECONDS = 0.2
+
+# 画質を保つために必要な1ピクセル・1フレームあたりのビット数の目安
+MIN_BITS_PER_PIXEL = 0.05
+
+
+# 範囲内に等間隔にサンプルを配置し、(開始位置（ミリ秒）, 長さ（秒）) のリストを返す
+# 範囲が短い場合は範囲全体を1つのサンプルとする
+def getSamples(trimStartPosMs: int, trimEndPosMs: int, count=SAMPLE_COUNT):
+    duration = (trimEndPosMs - trimStartPosMs) / 1000
+    if duration <= count * SAMPLE_SECONDS:
+        return [(trimStartPosMs, duration)]
+
+    samples = []
+    for index in range(count):
+        center = trimStartPosMs + (index + 0.5) * duration * 1000 / count
+        startMs = int(center - SAMPLE_SECONDS * 500)
+        samples.append((startMs, SAMPLE_SECONDS))
+    return samples
+
+
+# 範囲を連結した後の位置（ミリ秒）を元動画の位置に変換する
+def mapToSource(ranges: list, offsetMs: int):
+    for startMs, endMs in ranges:
+        if offsetMs < endMs - startMs:
+            return startMs + offsetMs
+        offsetMs -= endMs - startMs
+    return ranges[-1][1]
+
+
+# 映像のビットレート（ビット/秒）を解像度とフレームレートで割った値
+def getBitsPerPixel(videoBitRate: int, resolution: str, framerate: int):
+    return videoBitRate / budget.getPixelsPerSecond(resolution, framerate)
+
+
+# 画質の目安を満たす中で最も解像度・フレームレートの高い設定を返す
+# 現在の設定で満たしている場合や、満たす設定が無い場合はNone
+# 切り抜く場合は切り抜いた後の解像度で判定する
+def suggestSetting(
+    size: int,
+    duration: float,
+    resolution: str,
+    framerate: int,
+    noAudio: bool,
+    crop: dict = None,
+):
+    def bitsPerPixel(r: str, f: int):
+        r = expoter.getCroppedResolution(r, crop)
+        plan = expoter.planExport(size, duration, r, f, noAudio)
+        return getBitsPerPixel(plan["videoBitRate"], r, f)
+
+    if bitsPerPixel(resolution, framerate) >= MIN_BITS_PER_PIXEL:
+        return None
+
+    candidates = [
+        (r, f)
+        for r in settings.exportSettings["resolution"]
+        for f in settings.exportSettings["frameRate"]
+    ]
+    candidates.sort(
+        key=lambda c: budget.getPixelsPerSecond(
+            expoter.getCroppedResolution(c[0], crop), c[1]
+        ),
+        reverse=True,
+    )
+    for r, f in candidates:
+        if bitsPerPixel(r, f) >= MIN_BITS_PER_PIXEL:
+            return {"resolution": r, "frameRate": f}
+    return None
+
+
+# 範囲内の数か所を順にエンコードし、出力全体の容量と出力時間を予測する
+# rangesを指定した場合は、連結した後の長さに対してサンプルを配置する
+# cropを指定した場合は、切り抜いた後の解像度で計画・エンコードする
+# decimateを指定した場合は、サンプルも静止した場面を間引いてエンコードする
+# 失敗・キャンセルした場合はNoneを返す
+def predictExport(
+    inputPath: str,
+    trimStartPosMs: int,
+    trimEndPosMs: int,
+    resolution: str,
+    framerate: int,
+    size: int,
+    noAudio: bool,
+    twoPass: bool = True,
+    ranges: list = None,
+    crop: dict = None,
+    decimate: bool = False,
+    cancelEvent: threading.Event = None,
+):
+    if ranges:
+        totalMs = sum(endMs - startMs for startMs, endMs in ranges)
+        samples = [
+            (mapToSource(ranges, startMs), sampleDuration)
+            for startMs, sampleDuration in getSamples(0, totalMs)
+        ]
+        duration = round(totalMs / 1000, 2)
+    else:
+        samples = getSamples(trimStartPosMs, trimEndPosMs)
+        duration = round((trimEndPosMs - trimStartPosMs) / 1000, 2)
+    if duration <= 0:
+        return None
+
+    encoder = encoders.getAvailableEncoders("h264")[0]
+    outputResolution = expoter.getCroppedResolution(resolution, crop)
+    plan = expoter.planExport(
+        size, duration, outputResolution, framerate, noAudio, encoder, twoPass
+    )
+
+    workDir = tempfile.mkdtemp(prefix="To25_")
+    try:
+
+        def encodeSample(index: int):
+            startMs, sampleDuration = samples[index]
+            samplePath = os.path.join(workDir, "sample{}.mp4".format(index))
+            result = expoter.encode(
+                inputPath,
+                samplePath,
+                startMs,
+                sampleDuration,
+                outputResolution,
+                framerate,
+                encoder,
+                plan,
+                twoPass,
+                cancelEvent=cancelEvent,
+                crop=crop,
+                decimate=decimate,
+            )
+            if result.returncode != 0 or not os.path.isfile(samplePath):
+                return None
+            return os.path.getsize(samplePath)
+
+        # 並列に実行すると処理時間が互いに影響するため、1つずつ計測する
+        sampleSizes = []
+        sampleTimes = []
+        for index in range(len(samples)):
+            startTime = time.perf_counter()
+            sampleSize = encodeSample(index)
+            if sampleSize is None:
+                return None
+            sampleSizes.append(sampleSize)
+            sampleTimes.append(time.perf_counter() - startTime)
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    if cancelEvent is not None and cancelEvent.is_set():
+        return None
+
+    # サンプルの合計の長さあたりの容量と処理時間から全体を推定する
+    # 起動にかかる時間は長さに比例しないため、サンプルごとに差し引き、全体で1回分を加える
+    sampleDuration = sum(sampleDuration for startMs, sampleDuration in samples)
+    predictedSize = int(sum(sampleSizes) * duration / sampleDuration)
+    passCount = 2 if twoPass and encoder in expoter.TWO_PASS_ENCODERS else 1
+    startupTime = STARTUP_SECONDS * passCount
+    workTime = sum(max(t - startupTime, 0) for t in sampleTimes)
+    encodeTime = startupTime + workTime * duration / sampleDuration
+    fits = predictedSize <= size * 1024 * 1024
+    # 2パスで容量を超過した場合は、出力時に1度だけ再出力される
+    if twoPass and not fits:
+        encodeTime *= 2
+    return {
+        "size": predictedSize,
+        "encodeTime": encodeTime,
+        "fits": fits,
+        "encoder": encoder,
+        "bitsPerPixel": getBitsPerPixel(
+            plan["videoBitRate"], outputResolution, framerate
+        ),
+        "suggestion": suggestSetting(
+            size, duration, resolution, framerate, noAudio, crop
+        ),
+    }
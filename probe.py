@@ -0,0 +1,231 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+# Windows以外ではコンソールウィンドウの抑制は不要
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+# 同梱の実行ファイルを優先し、無ければPATHから探す
+def findExecutable(name: str):
+    for path in ["./" + name, "./" + name + ".exe"]:
+        if os.path.isfile(path):
+            return path
+    return shutil.which(name) or "./" + name
+
+
+FFMPEG_PATH = findExecutable("ffmpeg")
+FFPROBE_PATH = findExecutable("ffprobe")
+
+
+# プロセスを子プロセスも含めて強制終了する
+def killProcessTree(process: subprocess.Popen):
+    if os.name == "nt":
+        subprocess.run(
+            ["taskkill", "/F", "/T", "/PID", str(process.pid)],
+            creationflags=CREATE_NO_WINDOW,
+            capture_output=True,
+        )
+    else:
+        process.kill()
+
+
+# cancelEventがセットされるまで待機し、セットされたらプロセスを終了する
+def watchCancel(process: subprocess.Popen, cancelEvent: threading.Event):
+    while process.poll() is None:
+        if cancelEvent.wait(0.2):
+            killProcessTree(process)
+            return
+
+
+# onProgressを指定した場合は-progressの出力を読み取り、進捗を通知しながら実行する
+# cancelEventを指定した場合はセットされた時点でffmpegを終了する
+def runFFmpeg(
+    args: list,
+    duration: float = None,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    if cancelEvent is not None and cancelEvent.is_set():
+        return subprocess.CompletedProcess([FFMPEG_PATH] + args, 1, "", "cancelled")
+
+    if onProgress is None and cancelEvent is None:
+        return subprocess.run(
+            [FFMPEG_PATH] + args,
+            creationflags=CREATE_NO_WINDOW,
+            capture_output=True,
+            text=True,
+        )
+
+    commands = [FFMPEG_PATH, "-progress", "pipe:1", "-nostats"] + args
+    process = subprocess.Popen(
+        commands,
+        creationflags=CREATE_NO_WINDOW,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    # stderrのバッファが詰まらないよう別スレッドで読み取る
+    stderrLines = []
+    stderrThread = threading.Thread(
+        target=lambda: stderrLines.extend(process.stderr), daemon=True
+    )
+    stderrThread.start()
+
+    if cancelEvent is not None:
+        threading.Thread(
+            target=watchCancel, args=(process, cancelEvent), daemon=True
+        ).start()
+
+    block = {}
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        block[key] = value
+        if key == "progress" and onProgress is not None:
+            onProgress(parseProgress(block, duration))
+            block = {}
+
+    process.wait()
+    stderrThread.join()
+    return subprocess.CompletedProcess(
+        commands, process.returncode, "", "".join(stderrLines)
+    )
+
+
+# -progressの1ブロック分の出力を進捗情報に変換する
+def parseProgress(block: dict, duration: float = None):
+    try:
+        timeSec = int(block.get("out_time_us", "0")) / 1000000
+    except ValueError:
+        timeSec = 0.0
+    try:
+        speed = float(block.get("speed", "0").rstrip("x"))
+    except ValueError:
+        speed = 0.0
+    try:
+        frame = int(block.get("frame", "0"))
+    except ValueError:
+        frame = 0
+
+    ratio = 0.0
+    if duration:
+        ratio = min(max(timeSec / duration, 0.0), 1.0)
+    if block.get("progress") == "end":
+        ratio = 1.0
+
+    return {"time": timeSec, "frame": frame, "speed": speed, "ratio": ratio}
+
+
+def runFFprobe(args: list):
+    return subprocess.run(
+        [FFPROBE_PATH] + args,
+        creationflags=CREATE_NO_WINDOW,
+        capture_output=True,
+        text=True,
+    )
+
+
+# "30000/1001" 形式のフレームレートを数値に変換
+def parseFrameRate(rate: str):
+    try:
+        num, den = rate.split("/")
+        if float(den) == 0:
+            return 0.0
+        return float(num) / float(den)
+    except (ValueError, AttributeError):
+        return 0.0
+
+
+# 動画ファイルの情報を取得する
+def probeVideo(path: str):
+    result = runFFprobe(
+        [
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ]
+    )
+    if result.returncode != 0:
+        return None
+
+    try:
+        data = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return None
+
+    info = {
+        "duration": float(data.get("format", {}).get("duration", 0)),
+        "bitRate": int(data.get("format", {}).get("bit_rate", 0)),
+        "videoCodec": None,
+        "audioCodec": None,
+        "width": 0,
+        "height": 0,
+        "frameRate": 0.0,
+        "frameCount": 0,
+        # 映像ストリームのみのビットレートと、プロファイル・レベル・ピクセルフォーマット
+        "videoBitRate": 0,
+        "profile": None,
+        "level": None,
+        "pixelFormat": None,
+    }
+
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and info["videoCodec"] is None:
+            info["videoCodec"] = stream.get("codec_name")
+            info["width"] = int(stream.get("width", 0))
+            info["height"] = int(stream.get("height", 0))
+            info["frameRate"] = parseFrameRate(
+                stream.get("avg_frame_rate") or stream.get("r_frame_rate")
+            )
+            # コンテナによってはフレーム数が記録されていない
+            frameCount = str(stream.get("nb_frames", ""))
+            info["frameCount"] = int(frameCount) if frameCount.isdigit() else 0
+            videoBitRate = str(stream.get("bit_rate", ""))
+            info["videoBitRate"] = int(videoBitRate) if videoBitRate.isdigit() else 0
+            info["profile"] = stream.get("profile")
+            level = stream.get("level")
+            info["level"] = level if isinstance(level, int) and level > 0 else None
+            info["pixelFormat"] = stream.get("pix_fmt")
+        elif stream.get("codec_type") == "audio" and info["audioCodec"] is None:
+            info["audioCodec"] = stream.get("codec_name")
+
+    return info
+
+
+# 指定範囲のキーフレームの時刻（秒）を取得する
+def getKeyframes(path: str, startSec: float = None, endSec: float = None):
+    args = [
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "csv=p=0",
+    ]
+    if startSec is not None and endSec is not None:
+        args += ["-read_intervals", f"{startSec}%{endSec}"]
+
+    result = runFFprobe(args + [path])
+    if result.returncode != 0:
+        return []
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 2 or "K" not in fields[1]:
+            continue
+        try:
+            keyframes.append(float(fields[0]))
+        except ValueError:
+            continue
+
+    return sorted(keyframes)
@@ -0,0 +1,92 @@
+import os
+import threading
+
+import diskcache
+import encoders
+import probe
+import settings
+
+proxyFolderPath = settings.settingFolderPath / "proxies"
+proxyFolderPath.mkdir(parents=True, exist_ok=True)
+
+# プロキシのキャッシュの上限（バイト）
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+# プロキシを作成する元動画の条件（高さまたはビットレートがこれ以上）
+PROXY_MIN_HEIGHT = 1440
+PROXY_MIN_BIT_RATE = 30 * 1000 * 1000
+
+# プロキシの高さ・ビットレートとキーフレーム間隔（フレーム数）
+# キーフレーム間隔を短くし、シーク時にデコードするフレームを減らす
+PROXY_HEIGHT = 540
+PROXY_BIT_RATE = "2M"
+PROXY_GOP = 10
+
+
+# 再生時にプロキシを使用する動画か
+def needsProxy(info: dict):
+    if info is None:
+        return False
+    return info["height"] >= PROXY_MIN_HEIGHT or info["bitRate"] >= PROXY_MIN_BIT_RATE
+
+
+def getCachePath(sourceKey: str):
+    name = diskcache.hashKey(sourceKey, PROXY_HEIGHT, PROXY_BIT_RATE, PROXY_GOP)
+    return proxyFolderPath / (name + ".mp4")
+
+
+# 作成済みのプロキシのパスを返す（無い場合はNone）
+def findProxy(path: str):
+    sourceKey = diskcache.getSourceKey(path)
+    if sourceKey is None:
+        return None
+    cachePath = getCachePath(sourceKey)
+    if cachePath.exists() and diskcache.touch(cachePath):
+        return str(cachePath)
+    return None
+
+
+# 低解像度・短いキーフレーム間隔のプロキシを作成し、パスを返す（失敗した場合はNone）
+def createProxy(
+    path: str,
+    duration: float = None,
+    onProgress=None,
+    cancelEvent: threading.Event = None,
+):
+    proxyPath = findProxy(path)
+    if proxyPath is not None:
+        return proxyPath
+
+    sourceKey = diskcache.getSourceKey(path)
+    if sourceKey is None:
+        return None
+    cachePath = getCachePath(sourceKey)
+    tempPath = str(cachePath) + ".tmp.mp4"
+
+    # 使用可能なエンコーダーを優先順に試す
+    result = None
+    for encoder in encoders.getAvailableEncoders("h264"):
+        args = encoders.getInputArgs(encoder) + ["-i", path]
+        filters = ["scale=-2:{}".format(PROXY_HEIGHT)] + encoders.getFilters(encoder)
+        args += ["-vf", ",".join(filters), "-c:v", encoder]
+        if encoder == "libx264":
+            args += ["-preset", "veryfast", "-tune", "fastdecode"]
+        args += ["-g", str(PROXY_GOP), "-b:v", PROXY_BIT_RATE]
+        args += ["-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart"]
+        result = probe.runFFmpeg(
+            args + ["-y", tempPath], duration, onProgress, cancelEvent
+        )
+        if result.returncode == 0:
+            break
+
+    isCancelled = cancelEvent is not None and cancelEvent.is_set()
+    if result is None or result.returncode != 0 or isCancelled:
+        try:
+            os.remove(tempPath)
+        except OSError:
+            pass
+        return None
+
+    os.replace(tempPath, cachePath)
+    diskcache.evictCache(proxyFolderPath, MAX_CACHE_BYTES)
+    return str(cachePath)
@@ -0,0 +1,237 @@
+from PyQt6.QtCore import QLineF, QRect, QRectF, Qt
+from PyQt6.QtGui import QColor, QPainter, QPen, QPixmap
+
+import waveform
+
+# フィルムストリップのサムネイルの枚数
+FILMSTRIP_COUNT = 20
+# シークバーの下側に波形を描画する高さの割合
+WAVEFORM_HEIGHT_RATIO = 0.5
+# 再生位置の線を再描画する範囲の左右の余白（ピクセル）
+PLAYHEAD_MARGIN = 2
+# キーフレームの目盛りの高さ（ピクセル）
+KEYFRAME_TICK_HEIGHT = 6
+
+
+# シークバーの描画
+# 再生中に変化しない層（サムネイル・波形・トリミング範囲・枠線）は
+# 1枚の画像にまとめて保持し、再生位置が変わったときは線の周辺のみを再描画する
+class SeekBarRenderer:
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.devicePixelRatio = 1.0
+        self.duration = 0
+        self.trimStart = 0
+        self.trimEnd = 0
+        # 連結して出力するために追加したトリミング範囲の一覧
+        self.ranges = []
+
+        self.filmstrip = {}
+        self.waveform = None
+        self.waveformPixmap = None
+        self.keyframes = []
+        # サムネイルや波形が追加されるたびに増やし、静的な層の作り直しを判定する
+        self.contentVersion = 0
+
+        self.staticKey = None
+        self.staticPixmap = None
+
+    def setSize(self, width: int, height: int, devicePixelRatio: float = 1.0):
+        self.width = width
+        self.height = height
+        self.devicePixelRatio = devicePixelRatio
+
+    # 動画が切り替わったときはサムネイルと波形を破棄する
+    def setDuration(self, duration: int):
+        self.duration = duration
+        self.filmstrip = {}
+        self.waveform = None
+        self.waveformPixmap = None
+        self.keyframes = []
+        self.contentVersion += 1
+
+    def setTrim(self, trimStart: int, trimEnd: int):
+        self.trimStart = trimStart
+        self.trimEnd = trimEnd
+
+    # ranges は (開始位置, 終了位置)（ミリ秒）のリスト
+    def setRanges(self, ranges: list):
+        self.ranges = list(ranges)
+
+    def setFilmstripFrame(self, index: int, pixmap: QPixmap):
+        self.filmstrip[index] = pixmap
+        self.contentVersion += 1
+
+    def setWaveform(self, blocks):
+        self.waveform = blocks
+        self.waveformPixmap = None
+        self.contentVersion += 1
+
+    # keyframes はキーフレームの時刻（秒）の一覧
+    def setKeyframes(self, keyframes: list):
+        self.keyframes = keyframes
+        self.contentVersion += 1
+
+    def positionToX(self, position: int):
+        if self.duration == 0:
+            return 0
+        return int(self.width * position / self.duration)
+
+    # 再生位置の線が占める範囲（再描画する範囲）
+    def playheadRect(self, position: int):
+        x = self.positionToX(position)
+        return QRect(x - 1 - PLAYHEAD_MARGIN, 0, 1 + PLAYHEAD_MARGIN * 2, self.height)
+
+    # フィルムストリップを描画（縦横比を保ったまま中央を切り出す）
+    def paintFilmstrip(self, p: QPainter):
+        slotWidth = self.width / FILMSTRIP_COUNT
+        for index, pixmap in self.filmstrip.items():
+            if pixmap.isNull():
+                continue
+            target = QRectF(index * slotWidth, 0, slotWidth, self.height)
+            scale = max(
+                target.width() / pixmap.width(), target.height() / pixmap.height()
+            )
+            sourceWidth = target.width() / scale
+            sourceHeight = target.height() / scale
+            source = QRectF(
+                (pixmap.width() - sourceWidth) / 2,
+                (pixmap.height() - sourceHeight) / 2,
+                sourceWidth,
+                sourceHeight,
+            )
+            p.drawPixmap(target, pixmap, source)
+
+    # 波形の画像を作成する
+    def createWaveformPixmap(self):
+        width = self.width
+        height = int(self.height * WAVEFORM_HEIGHT_RATIO)
+        pixmap = QPixmap(width, height)
+        pixmap.fill(QColor(0, 0, 0, 120))
+
+        peaks = waveform.reducePeaks(self.waveform, width)
+        # 音量が小さい動画でも見えるよう最大音量で正規化する
+        peak = max(float(abs(peaks).max()), 1e-3)
+        peaks = peaks / peak * (height / 2)
+        middle = height / 2
+
+        p = QPainter(pixmap)
+        p.setPen(QColor(255, 255, 255, 150))
+        p.drawLines(
+            [
+                QLineF(x, middle - high, x, middle - low)
+                for x, (low, high, rms) in enumerate(peaks.tolist())
+            ]
+        )
+        p.setPen(QColor(255, 255, 255, 230))
+        p.drawLines(
+            [
+                QLineF(x, middle - rms, x, middle + rms)
+                for x, (low, high, rms) in enumerate(peaks.tolist())
+            ]
+        )
+        p.end()
+        return pixmap
+
+    def paintWaveform(self, p: QPainter):
+        if self.waveform is None:
+            return
+        height = int(self.height * WAVEFORM_HEIGHT_RATIO)
+        if (
+            self.waveformPixmap is None
+            or self.waveformPixmap.width() != self.width
+            or self.waveformPixmap.height() != height
+        ):
+            self.waveformPixmap = self.createWaveformPixmap()
+        p.drawPixmap(0, self.height - height, self.waveformPixmap)
+
+    # キーフレームの位置に目盛りを描画する
+    def paintKeyframes(self, p: QPainter):
+        if not self.keyframes:
+            return
+        p.setPen(QColor(255, 220, 0))
+        p.drawLines(
+            [
+                QLineF(x, 0, x, KEYFRAME_TICK_HEIGHT)
+                for x in {self.positionToX(k * 1000) for k in self.keyframes}
+            ]
+        )
+
+    # 再生位置以外の層をすべて描画する
+    def paintStaticLayers(self, p: QPainter):
+        self.paintFilmstrip(p)
+        self.paintWaveform(p)
+        self.paintKeyframes(p)
+
+        trimStart = self.positionToX(self.trimStart)
+        trimEnd = self.positionToX(self.trimEnd)
+
+        pen = QPen()
+        pen.setColor(Qt.GlobalColor.black)
+        pen.setWidth(2)
+        p.setPen(pen)
+
+        # 追加した範囲は編集中の範囲と区別できる色で描画する
+        p.setBrush(QColor(60, 200, 120, 90))
+        for rangeStart, rangeEnd in self.ranges:
+            x = self.positionToX(rangeStart)
+            rectangle = QRectF(x, 0, self.positionToX(rangeEnd) - x, self.height)
+            p.drawRoundedRect(rectangle, 5, 5)
+
+        p.setBrush(Qt.BrushStyle.SolidPattern)
+        p.setBrush(QColor(81, 93, 232, 100))
+        rectangle = QRectF(trimStart, 0, trimEnd - trimStart, self.height)
+        p.drawRoundedRect(rectangle, 5, 5)
+
+        p.setBrush(Qt.BrushStyle.NoBrush)
+        rectangle = QRectF(0, 0, self.width, self.height)
+        p.drawRoundedRect(rectangle, 5, 5)
+
+    def paintPlayhead(self, p: QPainter, position: int):
+        p.setPen(Qt.GlobalColor.red)
+        p.setBrush(Qt.GlobalColor.red)
+        p.drawRect(self.positionToX(position) - 1, 0, 1, self.height)
+
+    def createStaticPixmap(self):
+        pixmap = QPixmap(
+            int(self.width * self.devicePixelRatio),
+            int(self.height * self.devicePixelRatio),
+        )
+        pixmap.setDevicePixelRatio(self.devicePixelRatio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        p = QPainter(pixmap)
+        p.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        self.paintStaticLayers(p)
+        p.end()
+        return pixmap
+
+    # rectの範囲のみを描画する（静的な層は変更があったときのみ作り直す）
+    def paint(self, p: QPainter, position: int, rect: QRect = None):
+        if self.duration == 0 or self.width <= 0 or self.height <= 0:
+            return
+
+        key = (
+            self.width,
+            self.height,
+            self.devicePixelRatio,
+            self.duration,
+            self.trimStart,
+            self.trimEnd,
+            tuple(self.ranges),
+            self.contentVersion,
+        )
+        if key != self.staticKey:
+            self.staticPixmap = self.createStaticPixmap()
+            self.staticKey = key
+
+        if rect is None:
+            rect = QRect(0, 0, self.width, self.height)
+        source = QRectF(
+            rect.x() * self.devicePixelRatio,
+            rect.y() * self.devicePixelRatio,
+            rect.width() * self.devicePixelRatio,
+            rect.height() * self.devicePixelRatio,
+        )
+        p.drawPixmap(QRectF(rect), self.staticPixmap, source)
+        self.paintPlayhead(p, position)
@@ -0,0 +1,83 @@
+import os
+
+import diskcache
+import settings
+
+segmentFolderPath = settings.settingFolderPath / "segments"
+segmentFolderPath.mkdir(parents=True, exist_ok=True)
+
+# エンコード済みの区間のキャッシュの上限（バイト）
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+# 区間の境界とするキーフレームの最短の間隔（秒）
+SEGMENT_SECONDS = 10
+
+# 再利用する区間のビットレートの許容範囲（計画との差の割合）
+# トリミング範囲を少し変えるとビットレートの計画も少し変わるため、
+# 近いビットレートの区間はそのまま使い、差の分は新しくエンコードする区間で調整する
+BIT_RATE_TOLERANCE = 0.1
+# 再利用する区間を含めた映像全体のビット数が計画を超えてよい割合
+# （補正係数の更新などによる計画のわずかな変化で、同じ範囲を出力し直せなくならないようにする）
+BUDGET_SLACK = 0.01
+
+
+# 動画の先頭から一定間隔以上離れたキーフレームを区間の境界とし、
+# トリミング範囲と重なる区間を (開始位置（ミリ秒）, 長さ（秒）) のリストで返す
+# 境界はトリミング範囲によらず同じ位置になるため、範囲を変えても中間の区間は同じになる
+# 境界とトリミング範囲は動画の先頭からの出力フレームの間隔に揃え、各区間を整数フレームにする
+# （区間ごとにフレーム数が切り上がり、結合後のフレーム数が増えないようにする）
+def getSegments(
+    keyframes: list, trimStartPosMs: int, trimEndPosMs: int, framerate: int
+):
+    boundaries = []
+    for k in keyframes:
+        frame = round(k * framerate)
+        if not boundaries or frame - boundaries[-1] >= SEGMENT_SECONDS * framerate:
+            boundaries.append(frame)
+
+    startFrame = round(trimStartPosMs / 1000 * framerate)
+    endFrame = round(trimEndPosMs / 1000 * framerate)
+    frames = [startFrame]
+    frames += [b for b in boundaries if startFrame < b < endFrame]
+    frames.append(endFrame)
+    return [
+        (
+            int(round(frames[i] * 1000 / framerate)),
+            (frames[i + 1] - frames[i]) / framerate,
+        )
+        for i in range(len(frames) - 1)
+    ]
+
+
+# 区間の範囲とビットレート以外のエンコード設定からキャッシュのファイル名の接頭辞を作る
+def getCachePrefix(sourceKey: str, startMs: int, duration: float, *encodeSettings):
+    return diskcache.hashKey(
+        sourceKey, startMs, round(duration * 1000), *encodeSettings
+    )
+
+
+def getCachePath(prefix: str, videoBitRate: int):
+    return segmentFolderPath / "{}_{}.mp4".format(prefix, videoBitRate)
+
+
+# 許容範囲内のビットレートでエンコード済みの区間の (パス, ビットレート) のリストを
+# 計画に近い順に返す
+def findSegments(prefix: str, videoBitRate: int):
+    candidates = []
+    with os.scandir(segmentFolderPath) as entries:
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            if ext != ".mp4" or not name.startswith(prefix + "_"):
+                continue
+            try:
+                bitRate = int(name[len(prefix) + 1 :])
+            except ValueError:
+                continue
+            if abs(bitRate - videoBitRate) <= videoBitRate * BIT_RATE_TOLERANCE:
+                candidates.append((abs(bitRate - videoBitRate), bitRate, entry.path))
+
+    return [(path, bitRate) for difference, bitRate, path in sorted(candidates)]
+
+
+def evictCache():
+    diskcache.evictCache(segmentFolderPath, MAX_CACHE_BYTES)
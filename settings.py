@@ -2,7 +2,8 @@ import json
 import os
 from pathlib import Path
 
-settingFolderPath = Path(os.getenv("APPDATA")) / "To25"
+# Windows以外ではホームディレクトリ配下の.configに保存する
+settingFolderPath = Path(os.getenv("APPDATA", os.path.expanduser("~/.config"))) / "To25"
 settingFolderPath.mkdir(parents=True, exist_ok=True)
 settingFilePath = settingFolderPath / "settings.json"
 
@@ -18,11 +19,19 @@ class Settings:
                 "resolution": "1280x720",
                 "size": 25,
                 "noAudio": False,
+                "twoPass": True,
+                "allowCopy": True,
+                "parallelEncode": False,
+                "reuseSegments": False,
+                "decimate": False,
             },
             "clipPath": os.path.expanduser("~/Videos").replace("\\", "/"),
             "outputPath": os.path.expanduser("~/Desktop").replace("\\", "/"),
             "autoPlayClip": True,
             "openFolderAfterExport": True,
+            "exportWorkers": 1,
+            "snapToKeyframe": False,
+            "useProxy": False,
         }
 
         self.settings = default
@@ -44,6 +53,16 @@ class Settings:
 
     def check(self):
         try:
+            # 古い設定ファイルに存在しない項目を補完する
+            self.settings["defaultOptions"].setdefault("twoPass", True)
+            self.settings["defaultOptions"].setdefault("allowCopy", True)
+            self.settings["defaultOptions"].setdefault("parallelEncode", False)
+            self.settings["defaultOptions"].setdefault("reuseSegments", False)
+            self.settings["defaultOptions"].setdefault("decimate", False)
+            self.settings.setdefault("exportWorkers", 1)
+            self.settings.setdefault("snapToKeyframe", False)
+            self.settings.setdefault("useProxy", False)
+
             if (
                 self.settings["defaultOptions"]["resolution"]
                 not in exportSettings["resolution"]
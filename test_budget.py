@@ -0,0 +1,75 @@
+import unittest
+
+import budget
+
+MB = 1024 * 1024
+# 1280x720 30fps
+PIXELS_PER_SECOND = 1280 * 720 * 30
+
+# (長さ（秒）, 目標容量（MB）, 音声なし, 補正係数, 音声のビットレート, 収まるか)
+PLAN_TABLE = [
+    # 短い動画・大きい容量: 音声は最高のビットレート、映像は画質の上限まで
+    (10, 25, False, 1.0, 160000, True),
+    (10, 500, False, 1.0, 160000, True),
+    (10, 25, True, 1.0, 0, True),
+    # 中程度
+    (60, 25, False, 1.0, 160000, True),
+    (300, 25, False, 1.0, 64000, True),
+    (300, 8, True, 1.0, 0, True),
+    # 長い動画・小さい容量: 音声は最低のビットレートまで下げる
+    (600, 25, False, 1.0, 48000, True),
+    (1800, 25, True, 1.0, 0, True),
+    # 最低ビットレートでも収まらない
+    (3600, 10, False, 1.0, 48000, False),
+    (3600, 10, True, 1.0, 0, False),
+    (10, 0.01, False, 1.0, 48000, False),
+    # 補正後に映像の最低ビットレートまで引き上げられる場合
+    (1800, 25, True, 0.7, 0, False),
+    (1800, 25, True, 1.1, 0, True),
+]
+
+
+class PlanBudgetTest(unittest.TestCase):
+    def testTable(self):
+        for duration, sizeMB, noAudio, correction, audioBitRate, fits in PLAN_TABLE:
+            with self.subTest(
+                duration=duration, size=sizeMB, noAudio=noAudio, correction=correction
+            ):
+                targetBytes = int(sizeMB * MB)
+                plan = budget.planBudget(
+                    targetBytes, duration, 30, noAudio, PIXELS_PER_SECOND, correction
+                )
+
+                self.assertEqual(plan["audioBitRate"], audioBitRate)
+                self.assertEqual(
+                    plan["audioCodec"], None if noAudio else budget.AUDIO_CODEC
+                )
+                self.assertGreaterEqual(plan["videoBitRate"], budget.MIN_VIDEO_BIT_RATE)
+                self.assertLessEqual(
+                    plan["videoBitRate"] / correction,
+                    PIXELS_PER_SECOND * budget.MAX_BITS_PER_PIXEL + 1,
+                )
+                self.assertEqual(plan["fits"], fits)
+                self.assertEqual(plan["fits"], plan["estimatedBytes"] <= targetBytes)
+                if fits:
+                    self.assertLessEqual(plan["plannedBytes"], targetBytes)
+
+    # 音声は全体の一定割合以下に収まる最も高いビットレートを選ぶ
+    def testAudioBitRate(self):
+        self.assertEqual(budget.chooseAudioBitRate(2000000), 160000)
+        self.assertEqual(budget.chooseAudioBitRate(1000000), 96000)
+        self.assertEqual(budget.chooseAudioBitRate(100000), 48000)
+
+    # 長さと容量を共に2倍にすると、ビットレートはほぼ同じになる
+    def testBitRateScalesWithDuration(self):
+        short = budget.planBudget(10 * MB, 60, 30, True)
+        long = budget.planBudget(20 * MB, 120, 30, True)
+        self.assertAlmostEqual(
+            short["videoBitRate"],
+            long["videoBitRate"],
+            delta=short["videoBitRate"] / 50,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
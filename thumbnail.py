@@ -0,0 +1,144 @@
+import os
+import threading
+
+import diskcache
+import probe
+import settings
+
+thumbnailFolderPath = settings.settingFolderPath / "thumbnails"
+thumbnailFolderPath.mkdir(parents=True, exist_ok=True)
+
+# サムネイルのキャッシュの上限（バイト）
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+
+THUMBNAIL_WIDTH = 160
+
+# ホバー表示のサムネイルを共通化する時間の単位（ミリ秒）
+HOVER_STEP_MS = 1000
+
+KIND_FILMSTRIP = "filmstrip"
+KIND_HOVER = "hover"
+
+
+def getCachePath(sourceKey: str, timeMs: int, width: int, keyframeOnly: bool):
+    name = diskcache.hashKey(sourceKey, timeMs, width, keyframeOnly)
+    return thumbnailFolderPath / (name + ".jpg")
+
+
+# 指定時刻のフレームを縮小して保存し、画像のパスを返す（失敗した場合はNone）
+# keyframeOnlyの場合は指定時刻以降の最初のキーフレームのみをデコードするため高速
+def extractFrame(
+    path: str, timeMs: int, width=THUMBNAIL_WIDTH, keyframeOnly=False, sourceKey=None
+):
+    sourceKey = sourceKey or diskcache.getSourceKey(path)
+    if sourceKey is None:
+        return None
+
+    cachePath = getCachePath(sourceKey, timeMs, width, keyframeOnly)
+    if cachePath.exists() and diskcache.touch(cachePath):
+        return str(cachePath)
+
+    args = ["-v", "error"]
+    if keyframeOnly:
+        args += ["-skip_frame", "nokey"]
+    args += ["-ss", str(timeMs / 1000), "-i", path, "-frames:v", "1", "-an"]
+    args += ["-vf", "scale={}:-2".format(width), "-q:v", "5"]
+    # 書き込み途中のファイルを読まないよう一時ファイルに出力してから移動する
+    tempPath = str(cachePath) + ".tmp.jpg"
+    result = probe.runFFmpeg(args + ["-y", tempPath])
+    if result.returncode != 0 or not os.path.isfile(tempPath):
+        # 指定時刻以降にキーフレームが無い場合は通常のデコードでやり直す
+        if keyframeOnly:
+            return extractFrame(path, timeMs, width, False, sourceKey)
+        return None
+
+    os.replace(tempPath, cachePath)
+    return str(cachePath)
+
+
+def evictCache(maxBytes=MAX_CACHE_BYTES):
+    diskcache.evictCache(thumbnailFolderPath, maxBytes)
+
+
+# サムネイルを別スレッドで順に作成する
+# ホバー表示の要求はフィルムストリップより優先し、最新の要求のみを処理する
+class ThumbnailExtractor:
+    def __init__(self, onFrameReady):
+        # onFrameReady(種類, インデックスまたは時刻, 画像のパス)
+        self.onFrameReady = onFrameReady
+        self.condition = threading.Condition()
+        self.path = None
+        self.sourceKey = None
+        self.filmstripRequests = []
+        self.hoverRequest = None
+        self.generation = 0
+        self.isStopped = False
+
+        self.thread = threading.Thread(target=self.workerLoop, daemon=True)
+        self.thread.start()
+
+    # 動画を切り替え、等間隔のフィルムストリップの作成を開始する
+    def setSource(self, path: str, durationMs: int, count: int):
+        with self.condition:
+            self.generation += 1
+            self.path = path
+            self.sourceKey = diskcache.getSourceKey(path)
+            self.hoverRequest = None
+            slotMs = durationMs / count
+            self.filmstripRequests = [
+                (index, int(slotMs * (index + 0.5))) for index in range(count)
+            ]
+            self.condition.notify_all()
+
+    def requestHover(self, timeMs: int):
+        with self.condition:
+            if self.path is None:
+                return
+            self.hoverRequest = int(timeMs // HOVER_STEP_MS * HOVER_STEP_MS)
+            self.condition.notify_all()
+
+    def stop(self):
+        with self.condition:
+            self.isStopped = True
+            self.condition.notify_all()
+
+    def takeRequest(self):
+        if self.hoverRequest is not None:
+            timeMs = self.hoverRequest
+            self.hoverRequest = None
+            return KIND_HOVER, timeMs, timeMs
+        if self.filmstripRequests:
+            index, timeMs = self.filmstripRequests.pop(0)
+            return KIND_FILMSTRIP, index, timeMs
+        return None
+
+    def workerLoop(self):
+        while True:
+            with self.condition:
+                request = self.takeRequest()
+                while request is None and not self.isStopped:
+                    self.condition.wait()
+                    request = self.takeRequest()
+                if self.isStopped:
+                    return
+                path = self.path
+                sourceKey = self.sourceKey
+                generation = self.generation
+                isLastFrame = not self.filmstripRequests
+
+            kind, key, timeMs = request
+            imagePath = extractFrame(
+                path,
+                timeMs,
+                keyframeOnly=kind == KIND_FILMSTRIP,
+                sourceKey=sourceKey,
+            )
+
+            with self.condition:
+                isCurrent = generation == self.generation
+            if imagePath is not None and isCurrent:
+                self.onFrameReady(kind, key, imagePath)
+
+            # フィルムストリップの作成が終わったらキャッシュを整理する
+            if kind == KIND_FILMSTRIP and isLastFrame:
+                evictCache()
@@ -0,0 +1,270 @@
+# コマンドラインから動画を圧縮する（PyQt6を読み込まないため高速に起動する）
+# 使用例: python -m to25 compress replay1.mp4 replay2.mp4 --size 25 --res 1280x720 --fps 30
+import argparse
+import json
+import os
+import sys
+
+import expoter
+import exportqueue
+import probe
+import settings
+
+
+# "90"、"1:30"、"0:01:30.5" 形式の時間をミリ秒に変換
+# argparseのtypeとして使い、不正な形式は使用方法のエラーにする
+def parseTimeMs(text: str):
+    seconds = 0.0
+    try:
+        for part in text.split(":"):
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise argparse.ArgumentTypeError("時間の形式が不正です: {}".format(text))
+    if seconds < 0:
+        raise argparse.ArgumentTypeError("時間の形式が不正です: {}".format(text))
+    return int(seconds * 1000)
+
+
+# 容量・フレームレートなどの正の整数
+def parsePositiveInt(text: str):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("整数を指定してください: {}".format(text))
+    if value <= 0:
+        raise argparse.ArgumentTypeError("正の値を指定してください: {}".format(text))
+    return value
+
+
+# "1280x720" 形式の解像度
+def parseResolution(text: str):
+    try:
+        width, height = [int(part) for part in text.lower().split("x")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "解像度は 幅x高さ の形式で指定してください: {}".format(text)
+        )
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError("解像度が不正です: {}".format(text))
+    return "{}x{}".format(width, height)
+
+
+# "幅:高さ:X:Y" 形式の切り抜く範囲を辞書に変換
+def parseCrop(text: str):
+    try:
+        width, height, x, y = [int(part) for part in text.split(":")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "切り抜く範囲は 幅:高さ:X:Y の形式で指定してください: {}".format(text)
+        )
+    if width <= 0 or height <= 0 or x < 0 or y < 0:
+        raise argparse.ArgumentTypeError("切り抜く範囲が不正です: {}".format(text))
+    return {"x": x, "y": y, "width": width, "height": height}
+
+
+# 同じ名前の入力を同じフォルダに出力する場合は、連番を付けて上書きしないようにする
+# usedPathsは既に使用した出力先（正規化した絶対パス）の集合
+def getOutputPath(inputPath: str, outputDir: str, usedPaths: set = None):
+    baseName = os.path.splitext(os.path.basename(inputPath))[0] + "_comp"
+    folder = outputDir or os.path.dirname(inputPath) or "."
+    path = os.path.join(folder, baseName + ".mp4")
+    index = 2
+    while usedPaths and os.path.normcase(os.path.abspath(path)) in usedPaths:
+        path = os.path.join(folder, "{}_{}.mp4".format(baseName, index))
+        index += 1
+    return path
+
+
+def buildParser(defaultOptions: dict):
+    parser = argparse.ArgumentParser(prog="to25", description="To25 コマンドライン版")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compress = subparsers.add_parser("compress", help="動画を指定した容量に圧縮する")
+    compress.add_argument("inputs", nargs="+", help="入力する動画ファイル")
+    compress.add_argument(
+        "--size",
+        type=parsePositiveInt,
+        default=defaultOptions["size"],
+        help="出力容量（MB）",
+    )
+    compress.add_argument(
+        "--res",
+        type=parseResolution,
+        default=defaultOptions["resolution"],
+        help="解像度（例: 1280x720）",
+    )
+    compress.add_argument(
+        "--fps",
+        type=parsePositiveInt,
+        default=defaultOptions["frameRate"],
+        help="フレームレート",
+    )
+    compress.add_argument(
+        "--start",
+        type=parseTimeMs,
+        default="0",
+        help="トリミング開始位置（秒または時:分:秒）",
+    )
+    compress.add_argument(
+        "--end",
+        type=parseTimeMs,
+        default=None,
+        help="トリミング終了位置（省略時は動画の最後）",
+    )
+    compress.add_argument(
+        "--jobs", type=parsePositiveInt, default=1, help="同時に出力する数"
+    )
+    compress.add_argument(
+        "--output-dir", default=None, help="出力フォルダ（省略時は入力と同じフォルダ）"
+    )
+    compress.add_argument(
+        "--no-audio",
+        action="store_true",
+        default=defaultOptions["noAudio"],
+        help="音声を含めない",
+    )
+    compress.add_argument(
+        "--one-pass",
+        action="store_true",
+        default=not defaultOptions["twoPass"],
+        help="2パスエンコードを行わない",
+    )
+    compress.add_argument(
+        "--no-copy",
+        action="store_true",
+        default=not defaultOptions["allowCopy"],
+        help="無劣化コピーを行わない",
+    )
+    compress.add_argument(
+        "--parallel",
+        action="store_true",
+        default=defaultOptions["parallelEncode"],
+        help="範囲を分割して並列にエンコードする",
+    )
+    compress.add_argument(
+        "--cache",
+        action="store_true",
+        default=defaultOptions["reuseSegments"],
+        help="エンコード済みの区間を再利用する",
+    )
+    compress.add_argument(
+        "--crop",
+        type=parseCrop,
+        default=None,
+        help="切り抜く範囲（幅:高さ:X:Y、元動画のピクセル）",
+    )
+    compress.add_argument(
+        "--decimate",
+        action="store_true",
+        default=defaultOptions["decimate"],
+        help="静止した場面のフレームを間引いて可変フレームレートで出力する",
+    )
+    return parser
+
+
+# 1ファイルごとの結果をJSONの1行として出力する
+def printResult(job: dict):
+    result = job["result"] or {}
+    print(
+        json.dumps(
+            {
+                "input": job["args"][0],
+                "output": job["args"][1],
+                "status": job["status"],
+                "method": result.get("method"),
+                "size": result.get("outputSize", 0),
+                "targetSize": job["args"][6] * 1024 * 1024,
+                "elapsed": round(result.get("elapsed", 0.0), 3),
+                "droppedFrames": result.get("droppedFrames", 0),
+                "error": result.get("error"),
+            },
+            ensure_ascii=False,
+        ),
+        flush=True,
+    )
+
+
+# キューに追加できなかった入力の結果をJSONの1行として出力する
+def printRejected(inputPath: str, error: str):
+    print(
+        json.dumps(
+            {"input": inputPath, "status": expoter.STATUS_FAILED, "error": error},
+            ensure_ascii=False,
+        ),
+        flush=True,
+    )
+
+
+def compress(args: argparse.Namespace):
+    queue = exportqueue.ExportQueue(args.jobs)
+    startMs = args.start
+    rejectedCount = 0
+    usedPaths = set()
+
+    for inputPath in args.inputs:
+        if not os.path.isfile(inputPath):
+            printRejected(inputPath, "ファイルが見つかりません")
+            rejectedCount += 1
+            continue
+
+        if args.end is not None:
+            endMs = args.end
+        else:
+            info = probe.probeVideo(inputPath)
+            if info is None:
+                printRejected(inputPath, "動画の情報を取得できません")
+                rejectedCount += 1
+                continue
+            endMs = int(info["duration"] * 1000)
+
+        if endMs <= startMs:
+            printRejected(inputPath, "範囲が不正です")
+            rejectedCount += 1
+            continue
+
+        outputPath = getOutputPath(inputPath, args.output_dir, usedPaths)
+        usedPaths.add(os.path.normcase(os.path.abspath(outputPath)))
+        queue.addJob(
+            (
+                inputPath,
+                outputPath,
+                startMs,
+                endMs,
+                args.res,
+                args.fps,
+                args.size,
+                args.no_audio,
+                not args.one_pass,
+                not args.no_copy,
+                args.parallel,
+                args.cache,
+                None,
+                args.crop,
+                args.decimate,
+            )
+        )
+
+    queue.join()
+    queue.shutdown()
+
+    for job in queue.jobs:
+        printResult(job)
+
+    # 1つでも失敗した入力があれば失敗とする
+    return rejectedCount == 0 and all(
+        job["status"] == expoter.STATUS_DONE for job in queue.jobs
+    )
+
+
+def main(argv=None):
+    setting = settings.Settings()
+    setting.load()
+
+    args = buildParser(setting.settings["defaultOptions"]).parse_args(argv)
+    if args.command == "compress":
+        return 0 if compress(args) else 1
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+import diskcache
+import probe
+import settings
+
+waveformFolderPath = settings.settingFolderPath / "waveforms"
+waveformFolderPath.mkdir(parents=True, exist_ok=True)
+
+# 波形のキャッシュの上限（バイト）
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+# 解析用にデコードする音声のサンプリングレート
+SAMPLE_RATE = 8000
+# 1ブロック（20ミリ秒）あたりのサンプル数
+BLOCK_SAMPLES = 160
+# 一度に読み込むサンプル数（ブロックの整数倍にする）
+CHUNK_SAMPLES = BLOCK_SAMPLES * 4096
+
+# ブロックごとの値の列
+COLUMN_MIN = 0
+COLUMN_MAX = 1
+COLUMN_RMS = 2
+
+
+# 音声をモノラルの浮動小数点（-1.0～1.0）にデコードし、一定のサンプル数ずつ返す
+# 動画全体をメモリに載せないようffmpegの出力を順に読み取る
+def iterAudioChunks(
+    path: str,
+    sampleRate=SAMPLE_RATE,
+    chunkSamples=CHUNK_SAMPLES,
+    cancelEvent: threading.Event = None,
+):
+    commands = [probe.FFMPEG_PATH, "-v", "error", "-i", path, "-vn"]
+    commands += ["-ac", "1", "-ar", str(sampleRate), "-f", "s16le", "pipe:1"]
+    process = subprocess.Popen(
+        commands,
+        creationflags=probe.CREATE_NO_WINDOW,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while cancelEvent is None or not cancelEvent.is_set():
+            data = process.stdout.read(chunkSamples * 2)
+            if not data:
+                break
+            samples = np.frombuffer(data[: len(data) // 2 * 2], dtype="<i2")
+            yield samples.astype(np.float32) / 32768
+    finally:
+        if process.poll() is None:
+            probe.killProcessTree(process)
+        process.stdout.close()
+        process.wait()
+
+
+# 音声をブロックごとの最小値・最大値・RMSの配列（ブロック数×3）に変換する
+# 音声が無い場合は空の配列、キャンセルされた場合はNoneを返す
+def computeBlocks(path: str, cancelEvent: threading.Event = None):
+    parts = []
+    for chunk in iterAudioChunks(path, cancelEvent=cancelEvent):
+        # 最後の端数は無音で埋める
+        padding = -len(chunk) % BLOCK_SAMPLES
+        if padding:
+            chunk = np.pad(chunk, (0, padding))
+        blocks = chunk.reshape(-1, BLOCK_SAMPLES)
+        parts.append(
+            np.stack(
+                [
+                    blocks.min(axis=1),
+                    blocks.max(axis=1),
+                    np.sqrt(np.mean(blocks * blocks, axis=1)),
+                ],
+                axis=1,
+            )
+        )
+
+    if cancelEvent is not None and cancelEvent.is_set():
+        return None
+    if not parts:
+        return np.zeros((0, 3), dtype=np.float32)
+    return np.concatenate(parts).astype(np.float32)
+
+
+def getCachePath(sourceKey: str):
+    name = diskcache.hashKey(sourceKey, SAMPLE_RATE, BLOCK_SAMPLES)
+    return waveformFolderPath / (name + ".npy")
+
+
+# 動画の波形（ブロックごとの値）を取得する（キャッシュがあればそれを使う）
+# 音声が無い場合やキャンセルされた場合はNoneを返す
+def loadWaveform(path: str, cancelEvent: threading.Event = None):
+    sourceKey = diskcache.getSourceKey(path)
+    if sourceKey is None:
+        return None
+
+    cachePath = getCachePath(sourceKey)
+    blocks = None
+    if cachePath.exists() and diskcache.touch(cachePath):
+        try:
+            blocks = np.load(cachePath)
+        except (OSError, ValueError):
+            blocks = None
+
+    if blocks is None:
+        blocks = computeBlocks(path, cancelEvent)
+        if blocks is None:
+            return None
+        # 音声が無い動画も再解析しないよう空の配列を保存する
+        tempPath = str(cachePath) + ".tmp"
+        try:
+            with open(tempPath, "wb") as f:
+                np.save(f, blocks)
+            os.replace(tempPath, cachePath)
+        except OSError:
+            pass
+        diskcache.evictCache(waveformFolderPath, MAX_CACHE_BYTES)
+
+    if len(blocks) == 0:
+        return None
+    return blocks
+
+
+# ブロックごとの値をwidth個の区間（1ピクセルごと）にまとめる
+def reducePeaks(blocks: np.ndarray, width: int):
+    if len(blocks) == 0 or width <= 0:
+        return np.zeros((0, 3), dtype=np.float32)
+
+    edges = np.linspace(0, len(blocks), width + 1).astype(np.int64)
+    starts = np.minimum(edges[:-1], len(blocks) - 1)
+    counts = np.maximum(np.diff(edges), 1)
+
+    peaks = np.empty((width, 3), dtype=np.float32)
+    peaks[:, COLUMN_MIN] = np.minimum.reduceat(blocks[:, COLUMN_MIN], starts)
+    peaks[:, COLUMN_MAX] = np.maximum.reduceat(blocks[:, COLUMN_MAX], starts)
+    squares = blocks[:, COLUMN_RMS] * blocks[:, COLUMN_RMS]
+    peaks[:, COLUMN_RMS] = np.sqrt(np.add.reduceat(squares, starts) / counts)
+    return peaks